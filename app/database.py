@@ -1,7 +1,12 @@
-from sqlalchemy import create_engine
+from sqlalchemy import bindparam, create_engine, event, inspect, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateIndex
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
-from sqlalchemy.pool import StaticPool
-from typing import Generator
+from sqlalchemy.pool import NullPool, StaticPool
+from typing import Callable, Generator
+import logging
+
+logger = logging.getLogger(__name__)
 
 # ==================== КОНФИГУРАЦИЯ БД ====================
 DATABASE_URL = "sqlite:///./hackathon.db"
@@ -13,6 +18,32 @@ engine = create_engine(
     poolclass=StaticPool,  # Оптимально для SQLite
 )
 
+
+# Отдельный движок для фоновых задач и массового импорта. Основной engine —
+# одна общая sqlite3-коннекция (StaticPool) на все сессии API, и commit/rollback
+# батча на ней зафиксировал бы или откатил чужую незавершенную транзакцию.
+# Здесь каждая сессия получает свою коннекцию (NullPool), поэтому батч — это
+# действительно отдельная транзакция; конкурентные записи SQLite
+# сериализует блокировкой файла (timeout — сколько ждать ее освобождения).
+background_engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False, "timeout": 30},
+    poolclass=NullPool,
+)
+
+
+# SQLite по умолчанию игнорирует внешние ключи: без этого ON DELETE CASCADE /
+# SET NULL в моделях не срабатывают
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+if DATABASE_URL.startswith("sqlite"):
+    for bound_engine in (engine, background_engine):
+        event.listen(bound_engine, "connect", _enable_sqlite_foreign_keys)
+
 # SessionLocal (фабрика для создания сессий)
 SessionLocal = sessionmaker(
     bind=engine,
@@ -21,11 +52,138 @@ SessionLocal = sessionmaker(
     expire_on_commit=False,  # Не обнулять объекты после commit
 )
 
+# Сессии фоновых задач и импорта (на background_engine)
+BackgroundSessionLocal = sessionmaker(
+    bind=background_engine,
+    autocommit=False,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 # Base (базовый класс для всех моделей)
 class Base(DeclarativeBase):
     """Базовый класс для SQLAlchemy 2.0+ моделей"""
     pass
 
+def is_unique_violation(error: IntegrityError) -> bool:
+    """Нарушен ли уникальный индекс (а не, например, внешний ключ)"""
+    message = str(error.orig)
+    return "UNIQUE constraint failed" in message or "duplicate key value" in message
+
+
+def create_missing_indexes() -> None:
+    """
+    Создать индексы, которых нет в уже существующей БД.
+    create_all создает индексы только вместе с новыми таблицами.
+    Каждый индекс — отдельная транзакция: ошибка одного (например, дубликаты
+    под уникальным индексом) логируется и не мешает создать остальные.
+    """
+    for table in Base.metadata.tables.values():
+        for index in table.indexes:
+            try:
+                with engine.begin() as connection:
+                    connection.execute(CreateIndex(index, if_not_exists=True))
+            except Exception as e:
+                logger.error(f"✗ Не удалось создать индекс {index.name}: {e}")
+
+
+def create_missing_columns() -> None:
+    """
+    Добавить в уже существующие таблицы колонки, появившиеся в моделях.
+    create_all не меняет существующие таблицы. Новые колонки должны быть
+    nullable (или иметь server_default): у старых строк в них будет NULL.
+    """
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        existing_tables = set(inspector.get_table_names())
+        for table in Base.metadata.tables.values():
+            if table.name not in existing_tables:
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                connection.exec_driver_sql(ddl)
+
+
+def rebuild_with_autoincrement(table) -> bool:
+    """
+    Пересоздать таблицу SQLite с AUTOINCREMENT, если она была создана без него
+    (create_all не меняет существующие таблицы). Данные и индексы сохраняются.
+    На таблицу не должны ссылаться внешние ключи других таблиц.
+    Возвращает True, если таблица пересоздана.
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+
+    with engine.begin() as connection:
+        ddl = connection.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,)
+        ).scalar()
+        if ddl is None or "AUTOINCREMENT" in ddl.upper():
+            return False
+
+        # Индексы переезжают вместе с переименованной таблицей — удаляем их,
+        # table.create создаст их заново под теми же именами
+        index_names = connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (table.name,),
+        ).scalars().all()
+        for name in index_names:
+            connection.exec_driver_sql(f'DROP INDEX "{name}"')
+
+        old_name = f"{table.name}__old"
+        connection.exec_driver_sql(f'ALTER TABLE "{table.name}" RENAME TO "{old_name}"')
+        table.create(connection)
+
+        old_columns = {column["name"] for column in inspect(connection).get_columns(old_name)}
+        columns = ", ".join(f'"{column.name}"' for column in table.columns if column.name in old_columns)
+        connection.exec_driver_sql(
+            f'INSERT INTO "{table.name}" ({columns}) SELECT {columns} FROM "{old_name}"'
+        )
+        connection.exec_driver_sql(f'DROP TABLE "{old_name}"')
+    return True
+
+
+def backfill_normalized_column(key_column, source_column, normalize: Callable, batch_size: int = 1000) -> int:
+    """
+    Заполнить нормализованную shadow-колонку (Skill.name_key, User.username_key)
+    у строк, созданных до ее появления. Нормализация считается в Python.
+    Возвращает количество обновленных строк.
+
+    Строки перебираются по возрастанию первичного ключа: значения, которые
+    нормализуются в None (например, пустой username), остаются NULL и не
+    выбираются повторно.
+    """
+    table = key_column.table
+    pk = table.primary_key.columns.values()[0]
+    pending = select(pk, source_column).where(
+        key_column.is_(None), source_column.is_not(None), pk > bindparam("last_id")
+    ).order_by(pk).limit(batch_size)
+    statement = update(table).where(pk == bindparam("row_id")).values({key_column.key: bindparam("row_key")})
+
+    total = 0
+    last_id = 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(pending, {"last_id": last_id}).all()
+            keys = [
+                {"row_id": row_id, "row_key": key}
+                for row_id, key in ((row_id, normalize(value)) for row_id, value in rows)
+                if key is not None
+            ]
+            if keys:
+                connection.execute(statement, keys)
+        total += len(keys)
+        if len(rows) < batch_size:
+            return total
+        last_id = rows[-1][0]
+
+
 # ==================== ФУНКЦИЯ ЗАВИСИМОСТИ ====================
 def get_db() -> Generator:
     """
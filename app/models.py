@@ -1,7 +1,7 @@
 from sqlalchemy import (
-    Column, Integer, String, Text, DateTime, Boolean, BigInteger, Enum, ForeignKey, Table
+    Column, Integer, String, Text, DateTime, Boolean, BigInteger, Enum, ForeignKey, Table, Index, text
 )
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
 from datetime import datetime
 from enum import Enum as PyEnum
 from typing import List, Optional
@@ -24,6 +24,7 @@ class RequestStatus(PyEnum):
     accepted = "accepted"
     declined = "declined"
     canceled = "canceled"
+    expired = "expired"  # Истек по сроку (хакатон прошел или запрос слишком старый)
 
 
 # ==================== ТАБЛИЦЫ-ПОСРЕДНИКИ ====================
@@ -39,12 +40,27 @@ user_skills = Table(
 
 # ==================== МОДЕЛИ ====================
 
+def normalize_skill_name(name: str) -> str:
+    """
+    Ключ навыка для поиска без учета регистра.
+    Считается в Python: lower() в SQLite понимает только ASCII.
+    """
+    return " ".join(name.split()).casefold()
+
+
+def normalize_username(username: Optional[str]) -> Optional[str]:
+    """Ключ username для поиска без учета регистра (считается в Python, см. выше)"""
+    return username.casefold() if username else None
+
+
 class Skill(Base):
     """Навыки участников"""
     __tablename__ = "skills"
     
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String(100), unique=True, index=True)
+    # Нормализованное название (normalize_skill_name) для поиска по индексу
+    name_key: Mapped[Optional[str]] = mapped_column(String(100), index=True, nullable=True)
     
     # Связь M2M с User
     users: Mapped[List["User"]] = relationship(
@@ -54,6 +70,12 @@ class Skill(Base):
         cascade="all, delete",
     )
 
+    @validates("name")
+    def validate_name(self, key, name):
+        """name_key всегда соответствует name"""
+        self.name_key = normalize_skill_name(name)
+        return name
+
 
 class Hackathon(Base):
     """Хакатоны"""
@@ -66,15 +88,20 @@ class Hackathon(Base):
     end_date: Mapped[datetime] = mapped_column(DateTime, index=True)
     registration_deadline: Mapped[datetime] = mapped_column(DateTime, index=True, comment="До какого времени можно подать заявку")
     logo_url: Mapped[Optional[str]] = mapped_column(String(500), nullable=True, comment="Ссылка на логотип")
-    location: Mapped[str] = mapped_column(String(255), comment="Онлайн или город")
+    location: Mapped[str] = mapped_column(String(255), index=True, comment="Онлайн или город")
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # Версия строки для ETag / Last-Modified (NULL у строк, созданных до появления колонки)
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Связь с Team (one-to-many)
+    # passive_deletes: дочерние строки удаляет сама БД через ON DELETE,
+    # ORM не загружает их в память перед удалением родителя
     teams: Mapped[List["Team"]] = relationship(
         "Team",
         back_populates="hackathon",
         cascade="all, delete",
+        passive_deletes=True,
     )
     
     # Связь с Request (one-to-many)
@@ -82,6 +109,12 @@ class Hackathon(Base):
         "Request",
         back_populates="hackathon",
         cascade="all, delete",
+        passive_deletes=True,
+    )
+    
+    __table_args__ = (
+        # Список хакатонов: фильтр по is_active + сортировка по start_date
+        Index("ix_hackathons_active_start", "is_active", "start_date"),
     )
 
 
@@ -92,11 +125,18 @@ class User(Base):
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     tg_id: Mapped[int] = mapped_column(BigInteger, unique=True, index=True)  # Важно для телеграма
     username: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    # Нормализованный username (normalize_username) для поиска по индексу
+    username_key: Mapped[Optional[str]] = mapped_column(String(100), index=True, nullable=True)
     full_name: Mapped[str] = mapped_column(String(255))
     bio: Mapped[str] = mapped_column(Text, default="")
     main_role: Mapped[Optional[Role]] = mapped_column(Enum(Role), index=True, nullable=True, default=None)  # Опциональная роль
     ready_to_work: Mapped[bool] = mapped_column(Boolean, default=True)  # Готов ли работать (в проектах)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # Версия профиля для ETag: обновляется и при смене навыков / достижений
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Статистика достижений (app/utils/achievements.py), чтобы не загружать строки achievements
+    achievement_count: Mapped[Optional[int]] = mapped_column(Integer, default=0, nullable=True)
+    best_place: Mapped[Optional[int]] = mapped_column(Integer, nullable=True, comment="Лучшее занятое место")
     
     # Foreign Key на Team
     team_id: Mapped[Optional[int]] = mapped_column(
@@ -112,6 +152,7 @@ class User(Base):
         "Skill",
         secondary=user_skills,
         back_populates="users",
+        passive_deletes=True,
     )
     
     # One-to-many с Team (обратная ссылка из Team)
@@ -127,6 +168,7 @@ class User(Base):
         back_populates="user",
         foreign_keys="TeamRequest.user_id",
         cascade="all, delete",
+        passive_deletes=True,
     )
     
     # One-to-many (капитан команды)
@@ -134,6 +176,7 @@ class User(Base):
         "Team",
         back_populates="captain",
         foreign_keys="Team.captain_id",
+        passive_deletes=True,
     )
     
     # One-to-many с Achievement (достижения/портфолио)
@@ -141,6 +184,7 @@ class User(Base):
         "Achievement",
         back_populates="user",
         cascade="all, delete",
+        passive_deletes=True,
     )
     
     # One-to-many с Request (отправленные запросы)
@@ -149,6 +193,7 @@ class User(Base):
         back_populates="sender",
         foreign_keys="Request.sender_id",
         cascade="all, delete",
+        passive_deletes=True,
     )
     
     # One-to-many с Request (полученные запросы)
@@ -157,8 +202,15 @@ class User(Base):
         back_populates="receiver",
         foreign_keys="Request.receiver_id",
         cascade="all, delete",
+        passive_deletes=True,
     )
 
+    @validates("username")
+    def validate_username(self, key, username):
+        """username_key всегда соответствует username"""
+        self.username_key = normalize_username(username)
+        return username
+
 
 class Team(Base):
     """Команды в хакатоне"""
@@ -170,6 +222,8 @@ class Team(Base):
     chat_link: Mapped[str] = mapped_column(String(500), default="")  # Ссылка на ТГ чат
     is_looking: Mapped[bool] = mapped_column(Boolean, default=True)  # Ищем участников?
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # Версия строки команды для ETag (состав учитывается по версиям участников)
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Foreign Keys
     hackathon_id: Mapped[int] = mapped_column(
@@ -178,6 +232,9 @@ class Team(Base):
         index=True,
     )
     
+    # ON DELETE CASCADE удаляет команду вместе с капитаном; DELETE /users/{id}
+    # заранее передает капитанство участнику, так что каскад доходит только до
+    # команд без других участников
     captain_id: Mapped[int] = mapped_column(
         Integer,
         ForeignKey("users.id", ondelete="CASCADE"),
@@ -201,6 +258,7 @@ class Team(Base):
         "User",
         back_populates="team",
         foreign_keys="User.team_id",
+        passive_deletes=True,  # team_id участников обнуляет БД (ON DELETE SET NULL)
     )
     
     # Заявки/приглашения в команду
@@ -208,6 +266,7 @@ class Team(Base):
         "TeamRequest",
         back_populates="team",
         cascade="all, delete",
+        passive_deletes=True,
     )
     
     # Общие запросы к команде
@@ -215,6 +274,7 @@ class Team(Base):
         "Request",
         back_populates="team",
         cascade="all, delete",
+        passive_deletes=True,
     )
 
 
@@ -262,6 +322,20 @@ class TeamRequest(Base):
         back_populates="requests",
         foreign_keys=[team_id],
     )
+    
+    __table_args__ = (
+        # Входящие заявки команды: фильтр по статусу + сортировка по дате
+        Index("ix_team_requests_team_status_created", "team_id", "status", "created_at"),
+        # Не больше одной pending-заявки пользователя в команду (дубликаты отсекает БД)
+        Index(
+            "uq_team_requests_pending",
+            "user_id",
+            "team_id",
+            unique=True,
+            sqlite_where=text("status = 'pending'"),
+            postgresql_where=text("status = 'pending'"),
+        ),
+    )
 
 
 class Achievement(Base):
@@ -374,3 +448,81 @@ class Request(Base):
         "Hackathon",
         back_populates="requests",
     )
+    
+    __table_args__ = (
+        # Входящие запросы: личные (receiver_id) и к командам капитана (team_id)
+        Index("ix_requests_receiver_status_created", "receiver_id", "status", "created_at"),
+        Index("ix_requests_team_status_created", "team_id", "status", "created_at"),
+        # Не больше одного pending-запроса одного типа между теми же сторонами.
+        # NULL в уникальном индексе не равен NULL, поэтому receiver_id/team_id через coalesce
+        Index(
+            "uq_requests_pending",
+            "sender_id",
+            text("coalesce(receiver_id, 0)"),
+            text("coalesce(team_id, 0)"),
+            "request_type",
+            "hackathon_id",
+            unique=True,
+            sqlite_where=text("status = 'pending'"),
+            postgresql_where=text("status = 'pending'"),
+        ),
+        # AUTOINCREMENT: id не переиспользуются после переноса строк в архив
+        # (без него SQLite выдает max(id) + 1 и новый запрос получит id архивного)
+        {"sqlite_autoincrement": True},
+    )
+
+
+class RequestArchive(Base):
+    """
+    Архив завершенных запросов (accepted, declined, canceled, expired).
+
+    Фоновая задача переносит сюда старые завершенные строки из requests,
+    чтобы горячая таблица и ее индексы оставались маленькими.
+    id сохраняется тот же, что был в requests (requests с AUTOINCREMENT,
+    поэтому id архивных строк новым запросам не выдаются).
+    """
+    __tablename__ = "requests_archive"
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    
+    # Foreign Keys (каскадное удаление как у requests)
+    sender_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+    )
+    
+    receiver_id: Mapped[Optional[int]] = mapped_column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=True,
+    )
+    
+    team_id: Mapped[Optional[int]] = mapped_column(
+        Integer,
+        ForeignKey("teams.id", ondelete="CASCADE"),
+        nullable=True,
+    )
+    
+    hackathon_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("hackathons.id", ondelete="CASCADE"),
+        index=True,
+    )
+    
+    request_type: Mapped[RequestType] = mapped_column(Enum(RequestType))
+    status: Mapped[RequestStatus] = mapped_column(Enum(RequestStatus))
+    created_at: Mapped[datetime] = mapped_column(DateTime)
+    updated_at: Mapped[datetime] = mapped_column(DateTime)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    
+    # Связи (только для чтения — архив не меняется через ORM)
+    sender: Mapped["User"] = relationship("User", foreign_keys=[sender_id], viewonly=True)
+    receiver: Mapped[Optional["User"]] = relationship("User", foreign_keys=[receiver_id], viewonly=True)
+    team: Mapped[Optional["Team"]] = relationship("Team", viewonly=True)
+    hackathon: Mapped["Hackathon"] = relationship("Hackathon", viewonly=True)
+    
+    __table_args__ = (
+        Index("ix_requests_archive_sender_status_created", "sender_id", "status", "created_at"),
+        Index("ix_requests_archive_receiver_status_created", "receiver_id", "status", "created_at"),
+        Index("ix_requests_archive_team_status_created", "team_id", "status", "created_at"),
+    )
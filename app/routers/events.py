@@ -0,0 +1,77 @@
+"""
+Роутер push-уведомлений (Server-Sent Events)
+"""
+import asyncio
+import json
+
+from fastapi import APIRouter, Depends, Request as StarletteRequest
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.schemas import CurrentUser
+from app.utils.events import broker
+from app.utils.security import get_current_user
+
+router = APIRouter(
+    prefix="/events",
+    tags=["events"]
+)
+
+# Как часто слать heartbeat, если событий нет (секунды)
+HEARTBEAT_INTERVAL = 15
+
+
+def format_sse(event: dict) -> str:
+    """Сериализовать событие в формат text/event-stream"""
+    payload = json.dumps(event["data"], ensure_ascii=False, default=str)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {payload}\n\n"
+
+
+@router.get("/stream")
+async def stream_events(
+    http_request: StarletteRequest,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    GET /events/stream
+    Поток событий текущего пользователя (Server-Sent Events).
+
+    События:
+    - request.created / request.accepted / request.declined / request.canceled
+    - team_request.created / team_request.accepted / team_request.declined
+
+    Если событий нет, раз в 15 секунд приходит комментарий-heartbeat,
+    чтобы прокси не закрывали соединение. Клиенту больше не нужно
+    опрашивать /requests/received и /teams/{id}/requests.
+    """
+    user_id = current_user.id
+    # Сессия на все время стрима не нужна — пользователь уже получен
+    db.close()
+
+    subscription = broker.subscribe(user_id)
+
+    async def event_generator():
+        try:
+            yield f"retry: {HEARTBEAT_INTERVAL * 1000}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    if await http_request.is_disconnected():
+                        break
+                    yield ": heartbeat\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Отключаем буферизацию в nginx
+        },
+    )
@@ -1,23 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, case, func
 from datetime import datetime, timedelta
-from typing import List
+from typing import List, Optional
 
 from app.database import get_db
-from app.models import Hackathon
+from app.models import Hackathon, Request as RequestModel, RequestStatus, Team, TeamRequest, User
+from app.utils.cache import (
+    hackathon_calendar_cache,
+    hackathon_dashboard_cache,
+    invalidate_all_users,
+    invalidate_hackathons,
+    notification_message_cache,
+    request_summary_cache,
+    upcoming_notification_cache,
+)
+from app.utils.http_cache import (
+    CACHE_CONTROL_PUBLIC,
+    check_conditional,
+    conditional_response,
+    make_etag,
+    make_version_etag,
+)
+from app.utils.pagination import paginate
 from app.schemas import (
     HackathonCreate,
     HackathonUpdate,
     HackathonResponse,
     CalendarResponse,
     NotificationResponse,
+    HackathonDashboardResponse,
 )
 
 # ==================== РОУТЕР ====================
 
 router = APIRouter(prefix="/hackathons", tags=["hackathons"])
 
+# За сколько до старта хакатона показывать уведомление
+NOTIFICATION_WINDOW = timedelta(days=3)
+
 
 # ==================== ОСНОВНЫЕ CRUD ОПЕРАЦИИ ====================
 
@@ -45,33 +66,85 @@ def create_hackathon(hackathon_in: HackathonCreate, db: Session = Depends(get_db
     db.add(db_hackathon)
     db.commit()
     db.refresh(db_hackathon)
+
+    invalidate_hackathons()
     
     return db_hackathon
 
 
 @router.get("/", response_model=List[HackathonResponse])
 def get_all_hackathons(
-    skip: int = Query(0, ge=0, description="Количество записей для пропуска"),
+    request: Request,
+    response: Response,
+    is_active: Optional[bool] = Query(None, description="Только активные / только неактивные"),
+    date_from: Optional[datetime] = Query(None, description="Хакатоны, которые заканчиваются не раньше этой даты"),
+    date_to: Optional[datetime] = Query(None, description="Хакатоны, которые начинаются не позже этой даты"),
+    location: Optional[str] = Query(None, description="Точное значение location (например, Онлайн)"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (из заголовка X-Next-Cursor)"),
+    skip: int = Query(0, ge=0, deprecated=True, description="Устарело: используйте cursor"),
     limit: int = Query(10, ge=1, le=100, description="Максимум записей в ответе"),
     db: Session = Depends(get_db)
 ):
     """
     GET /hackathons/
-    Возвращает список всех хакатонов с пагинацией.
+    Возвращает список хакатонов, отсортированный по start_date.
     
     Query параметры:
-    - skip: смещение (по умолчанию 0)
+    - is_active: фильтр по активности
+    - date_from / date_to: хакатоны, пересекающиеся с периодом
+    - location: фильтр по месту проведения
+    - cursor: курсор следующей страницы из заголовка X-Next-Cursor
+    - skip: устаревшее смещение, игнорируется при переданном cursor
     - limit: лимит результатов (по умолчанию 10, макс 100)
+
+    Cache-Control: public, max-age=60. ETag — по версии всей таблицы
+    (количество + последнее изменение) и параметрам запроса.
     """
-    hackathons = db.query(Hackathon).offset(skip).limit(limit).all()
-    return hackathons
+    count, last_modified = db.query(
+        func.count(Hackathon.id),
+        func.max(func.coalesce(Hackathon.updated_at, Hackathon.created_at)),
+    ).one()
+    etag = make_version_etag("hackathons", count, last_modified, request.url.query)
+    not_modified = check_conditional(request, response, etag, last_modified, CACHE_CONTROL_PUBLIC)
+    if not_modified:
+        return not_modified
+
+    query = db.query(Hackathon)
+
+    # Каждый фильтр попадает в свой индекс: (is_active, start_date), end_date, location
+    if is_active is not None:
+        query = query.filter(Hackathon.is_active == is_active)
+    if date_from:
+        query = query.filter(Hackathon.end_date >= date_from)
+    if date_to:
+        query = query.filter(Hackathon.start_date <= date_to)
+    if location:
+        query = query.filter(Hackathon.location == location)
+
+    # Старые клиенты без курсора продолжают работать через skip (OFFSET)
+    return paginate(
+        query,
+        Hackathon.id,
+        limit,
+        cursor=cursor,
+        sort_column=Hackathon.start_date,
+        response=response,
+        offset=skip,
+    )
 
 
 @router.get("/{hackathon_id}", response_model=HackathonResponse)
-def get_hackathon_by_id(hackathon_id: int, db: Session = Depends(get_db)):
+def get_hackathon_by_id(
+    hackathon_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db)
+):
     """
     GET /hackathons/{hackathon_id}
     Возвращает информацию о конкретном хакатоне.
+
+    Cache-Control: public, max-age=60. ETag и Last-Modified — по updated_at.
     """
     hackathon = db.query(Hackathon).filter(Hackathon.id == hackathon_id).first()
     
@@ -80,6 +153,12 @@ def get_hackathon_by_id(hackathon_id: int, db: Session = Depends(get_db)):
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Хакатон с ID {hackathon_id} не найден"
         )
+
+    last_modified = hackathon.updated_at or hackathon.created_at
+    etag = make_version_etag("hackathon", hackathon.id, last_modified)
+    not_modified = check_conditional(request, response, etag, last_modified, CACHE_CONTROL_PUBLIC)
+    if not_modified:
+        return not_modified
     
     return hackathon
 
@@ -110,6 +189,8 @@ def update_hackathon(
     db.add(db_hackathon)
     db.commit()
     db.refresh(db_hackathon)
+
+    invalidate_hackathons()
     
     return db_hackathon
 
@@ -128,46 +209,144 @@ def delete_hackathon(hackathon_id: int, db: Session = Depends(get_db)):
             detail=f"Хакатон с ID {hackathon_id} не найден"
         )
     
+    # Команды хакатона, заявки в них и запросы (включая архив) удаляет БД
+    # через ON DELETE CASCADE, у участников команд team_id обнуляется (SET NULL).
+    # ORM не загружает их в память
     db.delete(db_hackathon)
     db.commit()
 
+    # Вместе с ним каскадно удалены запросы — счетчики затронутых пользователей устарели
+    request_summary_cache.clear()
+    invalidate_hackathons()
+    # team_id участников удаленных команд обнулила БД (SET NULL)
+    invalidate_all_users()
+
 
 # ==================== СПЕЦИАЛИЗИРОВАННЫЕ ЭНДПОИНТЫ ====================
 
 @router.get("/calendar/view", response_model=CalendarResponse)
-def get_hackathons_calendar(db: Session = Depends(get_db)):
+def get_hackathons_calendar(
+    request: Request,
+    upcoming_limit: Optional[int] = Query(None, ge=1, le=500, description="Максимум будущих хакатонов"),
+    history_limit: Optional[int] = Query(None, ge=1, le=500, description="Максимум прошедших хакатонов"),
+    db: Session = Depends(get_db)
+) -> Response:
     """
     GET /hackathons/calendar/view
     Возвращает список будущих и прошедших хакатонов.
-    Будущие отсортированы по start_date (от ближайшего к дальнему).
+    Будущие отсортированы по start_date (от ближайшего к дальнему),
+    прошедшие — от новых к старым.
+
+    Ответ кэшируется в сериализованном виде до ближайшего start_date или до
+    изменения хакатонов. Поддерживает If-None-Match: неизменившийся календарь — 304.
+    Cache-Control: no-cache (состав календаря зависит от текущего времени).
     """
-    now = datetime.utcnow()
-    
-    # Получаем все хакатоны
-    all_hackathons = db.query(Hackathon).all()
-    
-    # Разделяем на будущие и прошедшие
-    upcoming = [h for h in all_hackathons if h.start_date > now]
-    history = [h for h in all_hackathons if h.start_date <= now]
-    
-    # Сортируем будущие по start_date (от ближайшего)
-    upcoming.sort(key=lambda x: x.start_date)
-    
-    # Сортируем историю в обратном порядке (от новых к старым)
-    history.sort(key=lambda x: x.start_date, reverse=True)
-    
-    return CalendarResponse(
-        upcoming=[HackathonResponse.from_orm(h) for h in upcoming],
-        history=[HackathonResponse.from_orm(h) for h in history],
-    )
+    cache_key = (upcoming_limit, history_limit)
+    cached = hackathon_calendar_cache.get(cache_key)
+    if cached is None:
+        now = datetime.utcnow()
+
+        # Разделение и сортировка — в SQL, по индексу start_date
+        upcoming_query = db.query(Hackathon).filter(
+            Hackathon.start_date > now
+        ).order_by(Hackathon.start_date)
+        history_query = db.query(Hackathon).filter(
+            Hackathon.start_date <= now
+        ).order_by(Hackathon.start_date.desc())
+
+        if upcoming_limit:
+            upcoming_query = upcoming_query.limit(upcoming_limit)
+        if history_limit:
+            history_query = history_query.limit(history_limit)
+
+        upcoming = upcoming_query.all()
+        history = history_query.all()
+
+        body = CalendarResponse(
+            upcoming=[HackathonResponse.from_orm(h) for h in upcoming],
+            history=[HackathonResponse.from_orm(h) for h in history],
+        ).json().encode()
+        cached = (body, make_etag(body))
+
+        # Когда ближайший хакатон стартует, он должен переехать в историю
+        ttl = None
+        if upcoming:
+            ttl = min(hackathon_calendar_cache.ttl, (upcoming[0].start_date - now).total_seconds())
+        hackathon_calendar_cache.set(cache_key, cached, ttl=ttl)
+
+    body, etag = cached
+    return conditional_response(request, body, etag)
+
+
+def format_hours(hours_left: int) -> str:
+    """Количество часов с правильным склонением"""
+    if hours_left < 1:
+        return "менее часа"
+    elif hours_left == 1:
+        return "1 час"
+    elif hours_left % 10 == 1 and hours_left % 100 != 11:
+        return f"{hours_left} час"
+    elif hours_left % 10 in [2, 3, 4] and hours_left % 100 not in [12, 13, 14]:
+        return f"{hours_left} часа"
+    else:
+        return f"{hours_left} часов"
+
+
+def compute_upcoming_notification(db: Session, now: datetime) -> tuple:
+    """
+    Найти хакатон для уведомления и закэшировать его до следующей границы:
+    - старта этого хакатона (он выходит из окна)
+    - момента, когда следующий хакатон входит в окно NOTIFICATION_WINDOW
+
+    Возвращает (hackathon_id, title, start_date) или (None, None, None).
+    """
+    window_end = now + NOTIFICATION_WINDOW
+
+    # Ищем хакатон, который начнется в течение 3 дней
+    upcoming_hackathon = db.query(Hackathon).filter(
+        and_(
+            Hackathon.start_date > now,
+            Hackathon.start_date <= window_end,
+            Hackathon.is_active == True,
+        )
+    ).order_by(Hackathon.start_date).first()
+
+    # Ближайший хакатон, который еще не попал в окно
+    next_start = db.query(Hackathon.start_date).filter(
+        and_(
+            Hackathon.start_date > window_end,
+            Hackathon.is_active == True,
+        )
+    ).order_by(Hackathon.start_date).limit(1).scalar()
+
+    boundaries = []
+    if upcoming_hackathon:
+        entry = (upcoming_hackathon.id, upcoming_hackathon.title, upcoming_hackathon.start_date)
+        boundaries.append(upcoming_hackathon.start_date)
+    else:
+        entry = (None, None, None)
+    if next_start:
+        boundaries.append(next_start - NOTIFICATION_WINDOW)
+
+    ttl = None
+    if boundaries:
+        ttl = min(upcoming_notification_cache.ttl, (min(boundaries) - now).total_seconds())
+    upcoming_notification_cache.set("current", entry, ttl=ttl)
+    return entry
 
 
 @router.get("/notifications/check_upcoming", response_model=NotificationResponse)
-def check_upcoming_hackathon(db: Session = Depends(get_db)):
+def check_upcoming_hackathon(request: Request, response: Response, db: Session = Depends(get_db)):
     """
     GET /hackathons/notifications/check_upcoming
     Проверяет, есть ли хакатон, который начнется в течение 3 дней.
     Используется фронтендом при входе в приложение.
+
+    Ближайший хакатон кэшируется до следующей границы окна или изменения
+    хакатонов, готовые сообщения — по (hackathon_id, hours_left), так что
+    обычный вызов не обращается к БД.
+
+    Cache-Control: no-cache. ETag — по (hackathon_id, hours_left).
     
     Возвращает:
     - has_notification: bool
@@ -175,40 +354,98 @@ def check_upcoming_hackathon(db: Session = Depends(get_db)):
     - hackathon_id: int (если есть уведомление)
     """
     now = datetime.utcnow()
-    three_days_later = now + timedelta(days=3)
-    
-    # Ищем хакатон, который начнется в течение 3 дней
-    upcoming_hackathon = db.query(Hackathon).filter(
+
+    entry = upcoming_notification_cache.get("current")
+    if entry is None:
+        entry = compute_upcoming_notification(db, now)
+
+    hackathon_id, title, start_date = entry
+    # Вычисляем, через сколько часов начнется хакатон
+    hours_left = round((start_date - now).total_seconds() / 3600) if start_date else None
+
+    etag = make_version_etag("notification", hackathon_id, title, hours_left)
+    not_modified = check_conditional(request, response, etag)
+    if not_modified:
+        return not_modified
+
+    if hackathon_id is None:
+        return NotificationResponse(has_notification=False)
+
+    notification = notification_message_cache.get((hackathon_id, hours_left))
+    if notification is None:
+        message = f"Хакатон '{title}' начинается через {format_hours(hours_left)}! Успей собрать команду."
+        notification = NotificationResponse(
+            has_notification=True,
+            message=message,
+            hackathon_id=hackathon_id,
+        )
+        notification_message_cache.set((hackathon_id, hours_left), notification)
+
+    return notification
+
+
+@router.get("/{hackathon_id}/dashboard", response_model=HackathonDashboardResponse)
+def get_hackathon_dashboard(hackathon_id: int, db: Session = Depends(get_db)):
+    """
+    GET /hackathons/{hackathon_id}/dashboard
+    Сводка для организаторов: команды, участники по ролям, pending-запросы.
+
+    Считается несколькими GROUP BY запросами вместо постраничного обхода
+    /teams/ и /users/ на клиенте. Кэшируется на короткое время
+    (hackathon_dashboard_cache), поэтому цифры могут отставать на секунды.
+    """
+    dashboard = hackathon_dashboard_cache.get(hackathon_id)
+    if dashboard is not None:
+        return dashboard
+
+    if not db.query(Hackathon.id).filter(Hackathon.id == hackathon_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Хакатон с ID {hackathon_id} не найден"
+        )
+
+    # Команды: всего и ищущие участников
+    teams_total, teams_looking = db.query(
+        func.count(Team.id),
+        func.coalesce(func.sum(case((Team.is_looking == True, 1), else_=0)), 0),
+    ).filter(Team.hackathon_id == hackathon_id).one()
+
+    # Участники команд хакатона по ролям
+    role_rows = db.query(User.main_role, func.count(User.id)).join(
+        Team, User.team_id == Team.id
+    ).filter(Team.hackathon_id == hackathon_id).group_by(User.main_role).all()
+    participants_by_role = {
+        (role.value if role else "none"): count for role, count in role_rows
+    }
+
+    # pending-запросы по типам
+    request_rows = db.query(RequestModel.request_type, func.count(RequestModel.id)).filter(
         and_(
-            Hackathon.start_date > now,
-            Hackathon.start_date <= three_days_later,
-            Hackathon.is_active == True,
+            RequestModel.hackathon_id == hackathon_id,
+            RequestModel.status == RequestStatus.pending,
         )
-    ).order_by(Hackathon.start_date).first()
-    
-    if not upcoming_hackathon:
-        return NotificationResponse(has_notification=False)
-    
-    # Вычисляем, через сколько часов начнется хакатон
-    time_diff = upcoming_hackathon.start_date - now
-    hours_left = round(time_diff.total_seconds() / 3600)
-    
-    # Формируем сообщение с правильным склонением
-    if hours_left < 1:
-        hours_text = "менее часа"
-    elif hours_left == 1:
-        hours_text = "1 час"
-    elif hours_left % 10 == 1 and hours_left % 100 != 11:
-        hours_text = f"{hours_left} час"
-    elif hours_left % 10 in [2, 3, 4] and hours_left % 100 not in [12, 13, 14]:
-        hours_text = f"{hours_left} часа"
-    else:
-        hours_text = f"{hours_left} часов"
-    
-    message = f"Хакатон '{upcoming_hackathon.title}' начинается через {hours_text}! Успей собрать команду."
-    
-    return NotificationResponse(
-        has_notification=True,
-        message=message,
-        hackathon_id=upcoming_hackathon.id,
+    ).group_by(RequestModel.request_type).all()
+
+    # pending-заявки в команды хакатона
+    pending_team_requests = db.query(func.count(TeamRequest.id)).join(
+        Team, TeamRequest.team_id == Team.id
+    ).filter(
+        and_(
+            Team.hackathon_id == hackathon_id,
+            TeamRequest.status == RequestStatus.pending,
+        )
+    ).scalar()
+
+    dashboard = HackathonDashboardResponse(
+        hackathon_id=hackathon_id,
+        teams_total=teams_total,
+        teams_looking=teams_looking,
+        participants_total=sum(participants_by_role.values()),
+        participants_by_role=participants_by_role,
+        pending_requests={request_type.value: count for request_type, count in request_rows},
+        pending_team_requests=pending_team_requests,
+        generated_at=datetime.utcnow(),
     )
+    hackathon_dashboard_cache.set(hackathon_id, dashboard)
+
+    return dashboard
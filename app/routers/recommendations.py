@@ -3,19 +3,20 @@
 """
 from typing import List, Set, Tuple
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy import and_, or_, func
 
 from app.database import get_db
-from app.models import User, Team, Skill, Request as RequestModel, RequestStatus, RequestType
+from app.models import User, Team, Skill, Request as RequestModel, RequestArchive, RequestStatus, RequestType
 from app.schemas import (
     RecommendationRequest, 
     RecommendationResponse, 
     UserResponse, 
     TeamListResponse,
-    EnhancedRecommendation
+    EnhancedRecommendation,
+    CurrentUser
 )
-from app.utils.security import get_current_user  # Импортируем новую зависимость
+from app.utils.security import get_current_user, get_current_user_row  # Импортируем новую зависимость
 
 router = APIRouter(
     prefix="/recommendations",
@@ -25,11 +26,7 @@ router = APIRouter(
 
 def get_user_skills(user: User) -> Set[str]:
     """Получить набор навыков пользователя"""
-    try:
-        skills = user.skills or []
-        return {skill.name.lower() for skill in skills if skill and skill.name}
-    except Exception:
-        return set()
+    return {skill.name.lower() for skill in user.skills if skill.name}
 
 
 def get_user_roles_in_team(team: Team) -> Set[str]:
@@ -147,28 +144,24 @@ def calculate_collaboration_potential(user: User, team: Team, db: Session) -> Tu
     score = 0.0
     reasons = []
     
-    # Проверяем предыдущие запросы
-    previous_requests = db.query(RequestModel).filter(
-        and_(
-            RequestModel.hackathon_id == team.hackathon_id,
-            or_(
-                and_(
-                    RequestModel.sender_id == user.id,
-                    RequestModel.team_id == team.id
-                ),
-                and_(
-                    RequestModel.receiver_id == user.id,
-                    RequestModel.team_id == team.id
+    # Проверяем предыдущие принятые запросы (включая перенесенные в архив)
+    accepted = 0
+    for model in (RequestModel, RequestArchive):
+        accepted += db.query(func.count(model.id)).filter(
+            and_(
+                model.hackathon_id == team.hackathon_id,
+                model.team_id == team.id,
+                model.status == RequestStatus.accepted,
+                or_(
+                    model.sender_id == user.id,
+                    model.receiver_id == user.id
                 )
             )
-        )
-    ).all()
+        ).scalar()
     
-    if previous_requests:
-        accepted = sum(1 for r in previous_requests if r.status == RequestStatus.accepted)
-        if accepted > 0:
-            score += 0.2
-            reasons.append(f"Уже сотрудничали ранее ({accepted} раз)")
+    if accepted > 0:
+        score += 0.2
+        reasons.append(f"Уже сотрудничали ранее ({accepted} раз)")
     
     # Общие навыки с командой
     user_skills = get_user_skills(user)
@@ -271,17 +264,45 @@ def calculate_user_compatibility(
         score += 0.1
         reasons.append("Готов к работе")
     
-    if candidate.achievements:
-        score += min(len(candidate.achievements) * 0.05, 0.2)
-        reasons.append(f"Имеет достижения: {len(candidate.achievements)}")
+    # Денормализованный счетчик вместо загрузки candidate.achievements
+    if candidate.achievement_count:
+        score += min(candidate.achievement_count * 0.05, 0.2)
+        reasons.append(f"Имеет достижения: {candidate.achievement_count}")
     
     return min(score, 1.0), reasons
 
 
+def top_user_recommendations(
+    db: Session,
+    scored: List[Tuple[float, List[str], User]],
+    max_results: int,
+) -> List[EnhancedRecommendation]:
+    """
+    Отсортировать оцененных кандидатов и сериализовать только top max_results.
+    Достижения для профилей в ответе загружаются одним запросом на всю выдачу,
+    а не lazy load на каждого прошедшего min_score кандидата.
+    """
+    scored.sort(key=lambda item: item[0], reverse=True)
+    top = scored[:max_results]
+    if top:
+        db.query(User).options(selectinload(User.achievements)).filter(
+            User.id.in_([user.id for _, _, user in top])
+        ).all()
+    return [
+        EnhancedRecommendation(
+            recommended_user=UserResponse.from_orm(user),
+            recommended_team=None,
+            compatibility_score=score,
+            match_reasons=reasons
+        )
+        for score, reasons, user in top
+    ]
+
+
 @router.post("/", response_model=RecommendationResponse)
 async def get_recommendations(
     rec_request: RecommendationRequest,
-    current_user: User = Depends(get_current_user),  # Заменяем http_request
+    current_user: User = Depends(get_current_user_row),  # Навыки пользователя нужны для скоринга команд
     db: Session = Depends(get_db)
 ):
     """
@@ -357,8 +378,10 @@ async def get_recommendations(
             )
         )
         
-        users = users_query.all()
+        # Навыки нужны для скоринга всех кандидатов — одним запросом
+        users = users_query.options(selectinload(User.skills)).all()
         
+        scored = []
         for user in users:
             score, reasons = calculate_user_compatibility(
                 candidate=user,
@@ -372,12 +395,9 @@ async def get_recommendations(
             reasons.extend(collab_reasons)
             
             if score >= rec_request.min_score:
-                recommendations_list.append(EnhancedRecommendation(
-                    recommended_user=UserResponse.from_orm(user),
-                    recommended_team=None,
-                    compatibility_score=min(score, 1.0),
-                    match_reasons=reasons
-                ))
+                scored.append((min(score, 1.0), reasons, user))
+        
+        recommendations_list = top_user_recommendations(db, scored, rec_request.max_results)
     
     else:
         raise HTTPException(
@@ -399,7 +419,7 @@ async def get_recommendations(
 async def get_recommendations_for_team(
     team_id: int,
     rec_request: RecommendationRequest,
-    current_user: User = Depends(get_current_user),  # Заменяем http_request
+    current_user: CurrentUser = Depends(get_current_user),  # Заменяем http_request
     db: Session = Depends(get_db)
 ):
     """
@@ -437,9 +457,10 @@ async def get_recommendations_for_team(
         )
     )
     
-    users = users_query.all()
-    recommendations_list = []
+    # Навыки нужны для скоринга всех кандидатов — одним запросом
+    users = users_query.options(selectinload(User.skills)).all()
     
+    scored = []
     for user in users:
         score, reasons = calculate_user_compatibility(
             candidate=user,
@@ -449,16 +470,10 @@ async def get_recommendations_for_team(
         
         # Добавить если оценка выше минимума
         if score >= rec_request.min_score:
-            recommendations_list.append(EnhancedRecommendation(
-                recommended_user=UserResponse.from_orm(user),
-                recommended_team=None,
-                compatibility_score=score,
-                match_reasons=reasons
-            ))
+            scored.append((score, reasons, user))
     
     # Сортировать и ограничить результаты
-    recommendations_list.sort(key=lambda x: x.compatibility_score, reverse=True)
-    recommendations_list = recommendations_list[:rec_request.max_results]
+    recommendations_list = top_user_recommendations(db, scored, rec_request.max_results)
     
     return RecommendationResponse(
         recommendations=recommendations_list,
@@ -468,7 +483,7 @@ async def get_recommendations_for_team(
 
 @router.get("/stats", response_model=dict)
 async def get_recommendation_stats(
-    current_user: User = Depends(get_current_user),  # Заменяем http_request
+    current_user: CurrentUser = Depends(get_current_user),  # Заменяем http_request
     db: Session = Depends(get_db)
 ):
     """
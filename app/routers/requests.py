@@ -1,16 +1,33 @@
 """
 Роутер для управления запросами и приглашениями
 """
-from typing import List
+from typing import List, Optional, Set
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from starlette.requests import Request as StarletteRequest # Оставляем, если нужен для других целей
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
-from app.database import get_db
-from app.models import Request, RequestStatus, RequestType, User, Team, Hackathon
-from app.schemas import RequestResponse, RequestCreate, RequestUpdate
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import and_, func
+from sqlalchemy.exc import IntegrityError
+from app.database import get_db, is_unique_violation
+from app.models import Request, RequestArchive, RequestStatus, RequestType, User, Team, Hackathon
+from app.schemas import (
+    RequestResponse,
+    RequestCreate,
+    RequestUpdate,
+    UserResponse,
+    TeamResponse,
+    RequestSummaryResponse,
+    BulkInviteCreate,
+    BulkInviteResult,
+    BulkInviteResponse,
+    RequestListItem,
+    CurrentUser,
+)
 from app.utils.security import get_current_user # Импортируем новую зависимость
+from app.utils.cache import request_summary_cache, invalidate_request_summary, invalidate_user
+from app.utils.events import broker
 
 router = APIRouter(
     prefix="/requests",
@@ -26,14 +43,260 @@ router = APIRouter(
 #     return http_request.state.user
 
 
-@router.get("/sent", response_model=List[RequestResponse])
+# Максимум получателей в одном массовом приглашении
+MAX_BULK_INVITES = 50
+
+# Вложенные объекты, которые можно запросить через expand=
+REQUEST_EXPANSIONS = {"sender", "receiver", "team"}
+
+# Плоские поля RequestResponse, которые можно выбрать через fields=
+REQUEST_FIELDS = set(RequestResponse.__fields__) - REQUEST_EXPANSIONS
+
+
+def parse_csv_param(value: Optional[str], allowed: Set[str], param_name: str) -> Set[str]:
+    """Разобрать параметр вида "a,b,c" и проверить, что все значения допустимы"""
+    if not value:
+        return set()
+
+    items = {item.strip() for item in value.split(",") if item.strip()}
+    unknown = items - allowed
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown {param_name}: {', '.join(sorted(unknown))}. Allowed: {', '.join(sorted(allowed))}"
+        )
+    return items
+
+
+def user_loader(relationship_attr):
+    """selectinload пользователя вместе с навыками и достижениями (для UserResponse)"""
+    return selectinload(relationship_attr).options(
+        selectinload(User.skills),
+        selectinload(User.achievements),
+    )
+
+
+def expansion_options(expand: Set[str], model=Request) -> list:
+    """
+    Опции загрузки для запрошенных expand.
+    Каждое раскрытие — отдельный батч-запрос на всю страницу, а не lazy load на строку.
+    """
+    options = []
+    if "sender" in expand:
+        options.append(user_loader(model.sender))
+    if "receiver" in expand:
+        options.append(user_loader(model.receiver))
+    if "team" in expand:
+        options.append(selectinload(model.team).options(
+            user_loader(Team.captain),
+            user_loader(Team.members),
+        ))
+    return options
+
+
+def serialize_requests(requests: List[Request], expand: Set[str], fields: Set[str]) -> JSONResponse:
+    """
+    Собрать ответ только из запрошенных полей.
+    Вложенные sender/receiver/team попадают в ответ только если они есть в expand.
+    """
+    include = (fields or REQUEST_FIELDS) | {"id"} | expand
+    items = []
+    for req in requests:
+        item = RequestResponse(
+            id=req.id,
+            sender_id=req.sender_id,
+            receiver_id=req.receiver_id,
+            team_id=req.team_id,
+            request_type=req.request_type.value,
+            status=req.status.value,
+            hackathon_id=req.hackathon_id,
+            created_at=req.created_at,
+            sender=UserResponse.from_orm(req.sender) if "sender" in expand and req.sender else None,
+            receiver=UserResponse.from_orm(req.receiver) if "receiver" in expand and req.receiver else None,
+            team=TeamResponse.from_orm(req.team) if "team" in expand and req.team else None,
+        )
+        items.append(jsonable_encoder(item, include=include))
+    return JSONResponse(content=items)
+
+
+def sent_requests_query(
+    db: Session,
+    user_id: int,
+    status: RequestStatus = None,
+    request_type: RequestType = None,
+    model=Request,
+):
+    """Запрос исходящих для пользователя (model — requests или requests_archive)"""
+    query = db.query(model).filter(model.sender_id == user_id)
+
+    if status:
+        query = query.filter(model.status == status)
+
+    if request_type:
+        query = query.filter(model.request_type == request_type)
+
+    return query
+
+
+def received_requests_query(
+    db: Session,
+    user_id: int,
+    status: RequestStatus = None,
+    request_type: RequestType = None,
+    model=Request,
+):
+    """
+    Запрос входящих для пользователя одним SQL-выражением
+    (model — requests или requests_archive).
+
+    UNION двух веток вместо OR по receiver_id / team_id: личные запросы идут
+    по индексу (receiver_id, status, created_at), запросы к командам, где
+    пользователь капитан, — через JOIN teams и индекс (team_id, status, created_at).
+    Время ответа не зависит от того, сколько команд пользователь когда-либо вел.
+    """
+    personal = db.query(model).filter(model.receiver_id == user_id)
+    to_my_teams = db.query(model).join(
+        Team, Team.id == model.team_id
+    ).filter(Team.captain_id == user_id)
+
+    # Фильтры применяем в каждой ветке, чтобы они попадали в индексы
+    branches = []
+    for branch in (personal, to_my_teams):
+        if status:
+            branch = branch.filter(model.status == status)
+        if request_type:
+            branch = branch.filter(model.request_type == request_type)
+        branches.append(branch)
+
+    return branches[0].union(branches[1])
+
+
+def fetch_requests_page(
+    build_query,
+    status: Optional[RequestStatus],
+    expand: Set[str],
+    skip: int,
+    limit: int,
+) -> list:
+    """
+    Страница запросов, отсортированная от новых к старым.
+
+    build_query(model) строит отфильтрованный запрос для requests или requests_archive.
+    Архив читается только если фильтр status просит завершенные запросы —
+    pending-запросов в архиве не бывает.
+    """
+    if status is None or status == RequestStatus.pending:
+        return build_query(Request).options(*expansion_options(expand)).order_by(
+            Request.created_at.desc()
+        ).offset(skip).limit(limit).all()
+
+    # Из каждой таблицы берем первые skip + limit строк и сливаем
+    rows = []
+    for model in (Request, RequestArchive):
+        rows.extend(
+            build_query(model).options(*expansion_options(expand, model)).order_by(
+                model.created_at.desc()
+            ).limit(skip + limit).all()
+        )
+    rows.sort(key=lambda row: (row.created_at, row.id), reverse=True)
+    return rows[skip:skip + limit]
+
+
+def request_parties(db: Session, req: Request) -> Set[int]:
+    """
+    Пользователи, у которых меняются счетчики при изменении запроса:
+    отправитель, получатель и капитан команды (он видит запрос во входящих).
+    """
+    parties = {req.sender_id}
+    if req.receiver_id:
+        parties.add(req.receiver_id)
+    if req.team_id:
+        captain = db.query(Team.captain_id).filter(Team.id == req.team_id).first()
+        if captain:
+            parties.add(captain[0])
+    return parties
+
+
+def notify_request_parties(db: Session, req: Request, event_type: str, parties: Set[int] = None):
+    """
+    После commit: сбросить счетчики участников запроса и отправить им push-событие.
+    """
+    if parties is None:
+        parties = request_parties(db, req)
+    invalidate_request_summary(*parties)
+    broker.publish(parties, event_type, {
+        "request_id": req.id,
+        "request_type": req.request_type.value,
+        "status": req.status.value,
+        "sender_id": req.sender_id,
+        "receiver_id": req.receiver_id,
+        "team_id": req.team_id,
+        "hackathon_id": req.hackathon_id,
+    })
+
+
+def count_by_type(rows) -> dict:
+    """Превратить [(RequestType, count)] в словарь со всеми типами (нули по умолчанию)"""
+    counts = {request_type.value: 0 for request_type in RequestType}
+    for request_type, count in rows:
+        counts[request_type.value] = count
+    return counts
+
+
+@router.get("/summary", response_model=RequestSummaryResponse)
+async def get_requests_summary(
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Счетчики pending-запросов по типам для бейджей.
+
+    Отдается из кэша, который сбрасывается при каждом создании, принятии,
+    отклонении и отмене запроса, поэтому частый опрос не сканирует таблицу requests.
+    """
+    summary = request_summary_cache.get(current_user.id)
+    if summary is not None:
+        return summary
+
+    sent_rows = sent_requests_query(
+        db, current_user.id, RequestStatus.pending
+    ).with_entities(
+        Request.request_type, func.count(Request.id)
+    ).group_by(Request.request_type).all()
+
+    received_rows = received_requests_query(
+        db, current_user.id, RequestStatus.pending
+    ).with_entities(
+        Request.request_type, func.count(Request.id)
+    ).group_by(Request.request_type).all()
+
+    sent = count_by_type(sent_rows)
+    received = count_by_type(received_rows)
+    summary = RequestSummaryResponse(
+        sent=sent,
+        received=received,
+        total_sent=sum(sent.values()),
+        total_received=sum(received.values()),
+    )
+    request_summary_cache.set(current_user.id, summary)
+
+    return summary
+
+
+@router.get(
+    "/sent",
+    response_model=None,
+    responses={200: {"model": List[RequestListItem], "description": "Только поля из fields и объекты из expand"}},
+)
 async def get_sent_requests(
     # http_request: StarletteRequest, # Убираем
-    current_user: User = Depends(get_current_user), # Добавляем
+    current_user: CurrentUser = Depends(get_current_user), # Добавляем
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
     status: RequestStatus = None,
     request_type: RequestType = None,
+    expand: Optional[str] = Query(None, description="Раскрыть вложенные объекты: sender,receiver,team"),
+    fields: Optional[str] = Query(None, description="Вернуть только эти поля, например: id,status,created_at"),
     db: Session = Depends(get_db)
 ):
     """
@@ -41,33 +304,40 @@ async def get_sent_requests(
 
     - **skip**: Пропустить N записей
     - **limit**: Максимум записей на странице
-    - **status**: Фильтр по статусу (pending, accepted, declined, canceled)
+    - **status**: Фильтр по статусу (pending, accepted, declined, canceled, expired).
+      Для завершенных статусов результаты включают архив
     - **request_type**: Фильтр по типу (join_team, collaborate, invite)
+    - **expand**: Вложенные объекты (sender, receiver, team). По умолчанию только id
+    - **fields**: Список плоских полей ответа. По умолчанию все
     """
     # current_user = get_current_user_from_request(http_request) # Убираем
     # current_user уже получен из JWT
 
-    query = db.query(Request).filter(Request.sender_id == current_user.id)
-
-    if status:
-        query = query.filter(Request.status == status)
-
-    if request_type:
-        query = query.filter(Request.request_type == request_type)
+    expand_set = parse_csv_param(expand, REQUEST_EXPANSIONS, "expand")
+    fields_set = parse_csv_param(fields, REQUEST_FIELDS, "fields")
 
-    requests = query.order_by(Request.created_at.desc()).offset(skip).limit(limit).all()
+    requests = fetch_requests_page(
+        lambda model: sent_requests_query(db, current_user.id, status, request_type, model),
+        status, expand_set, skip, limit,
+    )
 
-    return requests
+    return serialize_requests(requests, expand_set, fields_set)
 
 
-@router.get("/received", response_model=List[RequestResponse])
+@router.get(
+    "/received",
+    response_model=None,
+    responses={200: {"model": List[RequestListItem], "description": "Только поля из fields и объекты из expand"}},
+)
 async def get_received_requests(
     # http_request: StarletteRequest, # Убираем
-    current_user: User = Depends(get_current_user), # Добавляем
+    current_user: CurrentUser = Depends(get_current_user), # Добавляем
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
     status: RequestStatus = None,
     request_type: RequestType = None,
+    expand: Optional[str] = Query(None, description="Раскрыть вложенные объекты: sender,receiver,team"),
+    fields: Optional[str] = Query(None, description="Вернуть только эти поля, например: id,status,created_at"),
     db: Session = Depends(get_db)
 ):
     """
@@ -79,40 +349,30 @@ async def get_received_requests(
 
     - **skip**: Пропустить N записей
     - **limit**: Максимум записей на странице
-    - **status**: Фильтр по статусу
+    - **status**: Фильтр по статусу. Для завершенных статусов результаты включают архив
     - **request_type**: Фильтр по типу
+    - **expand**: Вложенные объекты (sender, receiver, team). По умолчанию только id
+    - **fields**: Список плоских полей ответа. По умолчанию все
     """
     # current_user = get_current_user_from_request(http_request) # Убираем
     # current_user уже получен из JWT
 
-    # Получить команды, где пользователь капитан
-    captain_teams = db.query(Team.id).filter(Team.captain_id == current_user.id).all()
-    captain_team_ids = [t[0] for t in captain_teams]
+    expand_set = parse_csv_param(expand, REQUEST_EXPANSIONS, "expand")
+    fields_set = parse_csv_param(fields, REQUEST_FIELDS, "fields")
 
-    # Запросы где текущий пользователь получатель ИЛИ запросы к его командам
-    query = db.query(Request).filter(
-        or_(
-            Request.receiver_id == current_user.id,
-            Request.team_id.in_(captain_team_ids) if captain_team_ids else False
-        )
+    requests = fetch_requests_page(
+        lambda model: received_requests_query(db, current_user.id, status, request_type, model),
+        status, expand_set, skip, limit,
     )
 
-    if status:
-        query = query.filter(Request.status == status)
-
-    if request_type:
-        query = query.filter(Request.request_type == request_type)
-
-    requests = query.order_by(Request.created_at.desc()).offset(skip).limit(limit).all()
-
-    return requests
+    return serialize_requests(requests, expand_set, fields_set)
 
 
 @router.post("/", response_model=RequestResponse, status_code=201)
 async def create_request(
     # http_request: StarletteRequest, # Убираем
     req_data: RequestCreate,
-    current_user: User = Depends(get_current_user), # Добавляем
+    current_user: CurrentUser = Depends(get_current_user), # Добавляем
     db: Session = Depends(get_db)
 ):
     """
@@ -125,7 +385,7 @@ async def create_request(
 
     Валидация:
     - Нельзя отправить запрос самому себе
-    - Не может быть дубликата активного запроса с тем же типом
+    - Не может быть дубликата активного запроса с тем же типом (уникальный индекс в БД)
     - join_team: требует team_id
     - collaborate: требует receiver_id
     - invite: требует receiver_id и team_id, отправитель должен быть капитаном
@@ -208,25 +468,8 @@ async def create_request(
         if not receiver:
             raise HTTPException(status_code=404, detail="Receiver not found")
 
-    # Проверить дубликат активного запроса
-    existing_request = db.query(Request).filter(
-        and_(
-            Request.sender_id == current_user.id,
-            Request.receiver_id == req_data.receiver_id if req_data.receiver_id else True,
-            Request.team_id == req_data.team_id if req_data.team_id else True,
-            Request.request_type == req_data.request_type,
-            Request.status == RequestStatus.pending,
-            Request.hackathon_id == req_data.hackathon_id,
-        )
-    ).first()
-
-    if existing_request:
-        raise HTTPException(
-            status_code=400,
-            detail="Pending request of this type already exists"
-        )
-
-    # Создать новый запрос
+    # Создать новый запрос.
+    # Дубликат активного запроса отсекает уникальный индекс uq_requests_pending
     new_request = Request(
         sender_id=current_user.id,
         receiver_id=req_data.receiver_id,
@@ -237,17 +480,143 @@ async def create_request(
     )
 
     db.add(new_request)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        if is_unique_violation(e):
+            raise HTTPException(
+                status_code=400,
+                detail="Pending request of this type already exists"
+            )
+        # Нарушен внешний ключ: team_id/receiver_id ссылается на несуществующую запись
+        raise HTTPException(status_code=400, detail="Invalid team_id or receiver_id")
     db.refresh(new_request)
 
+    notify_request_parties(db, new_request, "request.created")
+
     return new_request
 
 
+@router.post("/invites/bulk", response_model=BulkInviteResponse, status_code=201)
+async def create_bulk_invites(
+    invite_data: BulkInviteCreate,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Пригласить в команду сразу нескольких пользователей (только капитан)
+
+    Хакатон, команда и права капитана проверяются один раз, получатели и
+    дубликаты pending-приглашений — двумя запросами на весь список.
+    Все приглашения создаются в одной транзакции.
+
+    Возвращает результат по каждому получателю: создано приглашение или нет и почему.
+    """
+    # Убираем повторы, сохраняя порядок
+    receiver_ids = list(dict.fromkeys(invite_data.receiver_ids))
+    if not receiver_ids:
+        raise HTTPException(status_code=400, detail="receiver_ids must not be empty")
+    if len(receiver_ids) > MAX_BULK_INVITES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many receivers: max {MAX_BULK_INVITES} per request"
+        )
+
+    hackathon = db.query(Hackathon).filter(
+        Hackathon.id == invite_data.hackathon_id
+    ).first()
+    if not hackathon:
+        raise HTTPException(status_code=404, detail="Hackathon not found")
+
+    team = db.query(Team).filter(Team.id == invite_data.team_id).first()
+    if not team:
+        raise HTTPException(status_code=404, detail="Team not found")
+
+    if team.captain_id != current_user.id:
+        raise HTTPException(
+            status_code=403,
+            detail="Only team captain can send invites"
+        )
+
+    # Существующие получатели — одним запросом
+    existing_ids = {
+        user_id for (user_id,) in db.query(User.id).filter(User.id.in_(receiver_ids))
+    }
+
+    # Уже отправленные pending-приглашения — одним запросом
+    already_invited = {
+        receiver_id for (receiver_id,) in db.query(Request.receiver_id).filter(
+            and_(
+                Request.sender_id == current_user.id,
+                Request.receiver_id.in_(receiver_ids),
+                Request.team_id == team.id,
+                Request.hackathon_id == hackathon.id,
+                Request.request_type == RequestType.invite,
+                Request.status == RequestStatus.pending,
+            )
+        )
+    }
+
+    results = {}
+    new_requests = []
+    for receiver_id in receiver_ids:
+        if receiver_id == current_user.id:
+            results[receiver_id] = BulkInviteResult(
+                receiver_id=receiver_id, created=False, detail="Cannot send request to yourself"
+            )
+        elif receiver_id not in existing_ids:
+            results[receiver_id] = BulkInviteResult(
+                receiver_id=receiver_id, created=False, detail="Receiver not found"
+            )
+        elif receiver_id in already_invited:
+            results[receiver_id] = BulkInviteResult(
+                receiver_id=receiver_id, created=False, detail="Pending request of this type already exists"
+            )
+        else:
+            new_requests.append(Request(
+                sender_id=current_user.id,
+                receiver_id=receiver_id,
+                team_id=team.id,
+                hackathon_id=hackathon.id,
+                request_type=RequestType.invite,
+                status=RequestStatus.pending,
+            ))
+
+    # Все приглашения — в одной транзакции. Если параллельный запрос успел
+    # создать такое же приглашение, уникальный индекс откатит весь батч
+    if new_requests:
+        db.add_all(new_requests)
+        try:
+            db.commit()
+        except IntegrityError as e:
+            db.rollback()
+            if is_unique_violation(e):
+                raise HTTPException(
+                    status_code=409,
+                    detail="Some invites were created concurrently, retry the request"
+                )
+            raise
+
+    for new_request in new_requests:
+        results[new_request.receiver_id] = BulkInviteResult(
+            receiver_id=new_request.receiver_id, created=True, request_id=new_request.id
+        )
+        notify_request_parties(
+            db, new_request, "request.created", {current_user.id, new_request.receiver_id}
+        )
+
+    return BulkInviteResponse(
+        results=[results[receiver_id] for receiver_id in receiver_ids],
+        created_count=len(new_requests),
+    )
+
+
 @router.post("/{request_id}/accept", response_model=RequestResponse)
 async def accept_request(
     # http_request: StarletteRequest, # Убираем
     request_id: int,
-    current_user: User = Depends(get_current_user), # Добавляем
+    current_user: CurrentUser = Depends(get_current_user), # Добавляем
     db: Session = Depends(get_db)
 ):
     """
@@ -303,6 +672,8 @@ async def accept_request(
 
     # Обновить статус
     req.status = RequestStatus.accepted
+    parties = request_parties(db, req)
+    affected_users = set(parties)
 
     # Дополнительные действия в зависимости от типа
     if req.request_type in [RequestType.join_team, RequestType.invite]:
@@ -312,7 +683,7 @@ async def accept_request(
             user.team_id = req.team_id
 
             # Отклонить все остальные pending запросы join_team от этого пользователя на этот хакатон
-            db.query(Request).filter(
+            other_requests = db.query(Request).filter(
                 and_(
                     Request.sender_id == req.sender_id,
                     Request.hackathon_id == req.hackathon_id,
@@ -320,11 +691,26 @@ async def accept_request(
                     Request.status == RequestStatus.pending,
                     Request.id != request_id
                 )
-            ).update({Request.status: RequestStatus.declined})
+            )
+
+            # У капитанов этих команд тоже меняются счетчики входящих
+            affected_users.update(
+                captain_id for (captain_id,) in other_requests.join(
+                    Team, Team.id == Request.team_id
+                ).with_entities(Team.captain_id)
+            )
+
+            other_requests.update({Request.status: RequestStatus.declined})
 
     db.commit()
     db.refresh(req)
 
+    invalidate_request_summary(*affected_users)
+    if req.request_type in [RequestType.join_team, RequestType.invite]:
+        # team_id отправителя входит в его профиль
+        invalidate_user(req.sender_id)
+    notify_request_parties(db, req, "request.accepted", parties)
+
     return req
 
 
@@ -332,7 +718,7 @@ async def accept_request(
 async def decline_request(
     # http_request: StarletteRequest, # Убираем
     request_id: int,
-    current_user: User = Depends(get_current_user), # Добавляем
+    current_user: CurrentUser = Depends(get_current_user), # Добавляем
     db: Session = Depends(get_db)
 ):
     """
@@ -389,6 +775,8 @@ async def decline_request(
     db.commit()
     db.refresh(req)
 
+    notify_request_parties(db, req, "request.declined")
+
     return req
 
 
@@ -396,7 +784,7 @@ async def decline_request(
 async def cancel_request(
     # http_request: StarletteRequest, # Убираем
     request_id: int,
-    current_user: User = Depends(get_current_user), # Добавляем
+    current_user: CurrentUser = Depends(get_current_user), # Добавляем
     db: Session = Depends(get_db)
 ):
     """
@@ -424,4 +812,6 @@ async def cancel_request(
     req.status = RequestStatus.canceled
     db.commit()
 
+    notify_request_parties(db, req, "request.canceled")
+
     return None
\ No newline at end of file
@@ -0,0 +1,30 @@
+"""
+Роутер справочника навыков
+"""
+from typing import List
+
+from fastapi import APIRouter, Query
+
+from app.schemas import SkillResponse
+from app.utils.skills import skill_catalog
+
+router = APIRouter(
+    prefix="/skills",
+    tags=["skills"]
+)
+
+
+@router.get("/suggest", response_model=List[SkillResponse])
+def suggest_skills(
+    q: str = Query(..., min_length=1, max_length=100, description="Начало названия навыка"),
+    limit: int = Query(10, ge=1, le=50, description="Максимум подсказок"),
+):
+    """
+    GET /skills/suggest?q=
+    Автодополнение навыков по началу названия (без учета регистра).
+    Отвечает из in-memory каталога, без обращения к БД.
+    """
+    return [
+        SkillResponse(id=skill_id, name=name)
+        for skill_id, name in skill_catalog.suggest(q, limit)
+    ]
@@ -1,10 +1,11 @@
 # app/routers/teams.py
 
-from fastapi import APIRouter, Depends, HTTPException, status, Request # Оставляем Request только если нужно для других целей, но не для user
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from typing import List
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Query, Response # Оставляем Request только если нужно для других целей, но не для user
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from typing import List, Optional
+from app.database import get_db, is_unique_violation
 from app.models import User, Team, Hackathon, TeamRequest, RequestStatus
 from app.schemas import (
     TeamCreate,
@@ -13,8 +14,13 @@ from app.schemas import (
     TeamListResponse,
     TeamRequestResponse,
     UserResponse,
+    CurrentUser,
 )
-from app.utils.security import get_current_user # Импортируем новую зависимость
+from app.utils.security import get_current_user, get_current_user_row # Импортируем новую зависимость
+from app.utils.pagination import paginate
+from app.utils.cache import invalidate_user, request_summary_cache
+from app.utils.events import broker
+from app.utils.http_cache import check_conditional, make_version_etag
 
 # ==================== РОУТЕР ====================
 
@@ -35,6 +41,17 @@ router = APIRouter(prefix="/teams", tags=["teams"])
 #     return user
 
 
+def notify_team_request(team_request: TeamRequest, team: Team, event_type: str):
+    """Отправить push-событие о заявке автору заявки и капитану команды (после commit)"""
+    broker.publish({team_request.user_id, team.captain_id}, event_type, {
+        "team_request_id": team_request.id,
+        "user_id": team_request.user_id,
+        "team_id": team_request.team_id,
+        "is_invite": team_request.is_invite,
+        "status": team_request.status.value,
+    })
+
+
 def check_user_is_captain(team: Team, user: User):
     """Проверить, что пользователь — капитан команды"""
     if team.captain_id != user.id:
@@ -49,7 +66,7 @@ def check_user_is_captain(team: Team, user: User):
 @router.post("/", response_model=TeamResponse, status_code=status.HTTP_201_CREATED)
 def create_team(
     team_in: TeamCreate,
-    current_user: User = Depends(get_current_user), # Заменяем request на current_user
+    current_user: User = Depends(get_current_user_row), # Заменяем request на current_user
     db: Session = Depends(get_db)
 ):
     """
@@ -101,15 +118,19 @@ def create_team(
 
     db.commit()
     db.refresh(new_team)
+    invalidate_user(current_user.id)
 
     return new_team
 
 
 @router.get("/{team_id}", response_model=TeamResponse)
-def get_team(team_id: int, db: Session = Depends(get_db)):
+def get_team(team_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
     """
     GET /teams/{team_id}
     Получить информацию о команде (капитан + участники).
+
+    Cache-Control: no-cache. ETag — по версиям команды, капитана и участников;
+    If-None-Match с тем же ETag — 304 без загрузки профилей.
     """
     team = db.query(Team).filter(Team.id == team_id).first()
 
@@ -119,6 +140,18 @@ def get_team(team_id: int, db: Session = Depends(get_db)):
             detail=f"Команда с ID {team_id} не найдена"
         )
 
+    # Профили капитана и участников входят в ответ — учитываем их версии
+    people = db.query(User.id, User.updated_at, User.created_at).filter(
+        or_(User.team_id == team_id, User.id == team.captain_id)
+    ).order_by(User.id).all()
+    etag = make_version_etag(
+        "team", team.id, team.updated_at or team.created_at,
+        *[(person.id, person.updated_at or person.created_at) for person in people],
+    )
+    not_modified = check_conditional(request, response, etag)
+    if not_modified:
+        return not_modified
+
     return team
 
 
@@ -149,7 +182,7 @@ def get_teams(
 def update_team(
     team_id: int,
     team_update: TeamUpdate,
-    current_user: User = Depends(get_current_user), # Заменяем request на current_user
+    current_user: CurrentUser = Depends(get_current_user), # Заменяем request на current_user
     db: Session = Depends(get_db)
 ):
     """
@@ -186,7 +219,7 @@ def update_team(
 @router.delete("/{team_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_team(
     team_id: int,
-    current_user: User = Depends(get_current_user), # Заменяем request на current_user
+    current_user: CurrentUser = Depends(get_current_user), # Заменяем request на current_user
     db: Session = Depends(get_db)
 ):
     """
@@ -208,19 +241,26 @@ def delete_team(
     check_user_is_captain(team, current_user)
 
     # Сбрасываем team_id у всех участников
+    member_ids = [member_id for (member_id,) in db.query(User.id).filter(User.team_id == team_id)]
     db.query(User).filter(User.team_id == team_id).update({User.team_id: None})
 
     # Удаляем команду
+    # Заявки и запросы к команде удаляет БД через ON DELETE,
+    # ORM не загружает их в память
     db.delete(team)
     db.commit()
 
+    # Вместе с ней каскадно удалены запросы — счетчики затронутых пользователей устарели
+    request_summary_cache.clear()
+    invalidate_user(*member_ids)
+
 
 # ==================== ВСТУПЛЕНИЕ И ВЫХОД ====================
 
 @router.post("/{team_id}/join", status_code=status.HTTP_201_CREATED)
 def send_join_request(
     team_id: int,
-    current_user: User = Depends(get_current_user), # Заменяем request на current_user
+    current_user: CurrentUser = Depends(get_current_user), # Заменяем request на current_user
     db: Session = Depends(get_db)
 ):
     """
@@ -260,22 +300,8 @@ def send_join_request(
             detail="Вы — капитан другой команды на этом хакатоне"
         )
 
-    # Проверяем, что нет уже запроса от этого юзера
-    existing_request = db.query(TeamRequest).filter(
-        and_(
-            TeamRequest.user_id == current_user.id,
-            TeamRequest.team_id == team_id,
-            TeamRequest.status == RequestStatus.pending
-        )
-    ).first()
-
-    if existing_request:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Вы уже отправили запрос в эту команду"
-        )
-
-    # Создаем запрос
+    # Создаем запрос.
+    # Повторную pending-заявку отсекает уникальный индекс uq_team_requests_pending
     new_request = TeamRequest(
         user_id=current_user.id,
         team_id=team_id,
@@ -284,16 +310,27 @@ def send_join_request(
     )
 
     db.add(new_request)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        if is_unique_violation(e):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Вы уже отправили запрос в эту команду"
+            )
+        raise
     db.refresh(new_request)
 
+    notify_team_request(new_request, team, "team_request.created")
+
     return {"id": new_request.id, "status": "Запрос отправлен"}
 
 
 @router.post("/{team_id}/leave", status_code=status.HTTP_200_OK)
 def leave_team(
     team_id: int,
-    current_user: User = Depends(get_current_user), # Заменяем request на current_user
+    current_user: User = Depends(get_current_user_row), # Заменяем request на current_user
     db: Session = Depends(get_db)
 ):
     """
@@ -328,6 +365,7 @@ def leave_team(
     # Сбрасываем team_id
     current_user.team_id = None
     db.commit()
+    invalidate_user(current_user.id)
 
     return {"status": "Вы покинули команду"}
 
@@ -338,7 +376,7 @@ def leave_team(
 def kick_user_from_team(
     team_id: int,
     user_id: int,
-    current_user: User = Depends(get_current_user), # Заменяем request на current_user
+    current_user: CurrentUser = Depends(get_current_user), # Заменяем request на current_user
     db: Session = Depends(get_db)
 ):
     """
@@ -384,6 +422,7 @@ def kick_user_from_team(
     # Выгоняем пользователя
     user_to_kick.team_id = None
     db.commit()
+    invalidate_user(user_to_kick.id)
 
     return {"status": f"Пользователь {user_id} исключен из команды"}
 
@@ -394,7 +433,7 @@ def kick_user_from_team(
 def accept_join_request(
     team_id: int,
     request_id: int,
-    current_user: User = Depends(get_current_user), # Заменяем request на current_user
+    current_user: CurrentUser = Depends(get_current_user), # Заменяем request на current_user
     db: Session = Depends(get_db)
 ):
     """
@@ -470,6 +509,9 @@ def accept_join_request(
 
     db.commit()
 
+    invalidate_user(user.id)
+    notify_team_request(team_request, team, "team_request.accepted")
+
     return {"status": "Запрос принят, пользователь добавлен в команду"}
 
 
@@ -477,7 +519,7 @@ def accept_join_request(
 def decline_join_request(
     team_id: int,
     request_id: int,
-    current_user: User = Depends(get_current_user), # Заменяем request на current_user
+    current_user: CurrentUser = Depends(get_current_user), # Заменяем request на current_user
     db: Session = Depends(get_db)
 ):
     """
@@ -524,6 +566,8 @@ def decline_join_request(
     team_request.status = RequestStatus.declined
     db.commit()
 
+    notify_team_request(team_request, team, "team_request.declined")
+
     return {"status": "Запрос отклонен"}
 
 
@@ -532,13 +576,25 @@ def decline_join_request(
 @router.get("/{team_id}/requests", response_model=List[TeamRequestResponse])
 def get_team_requests(
     team_id: int,
-    current_user: User = Depends(get_current_user), # Заменяем request на current_user
+    response: Response,
+    request_status: RequestStatus = Query(RequestStatus.pending, alias="status", description="Фильтр по статусу заявки"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (из заголовка X-Next-Cursor)"),
+    limit: int = Query(20, ge=1, le=100, description="Максимум записей в ответе"),
+    current_user: CurrentUser = Depends(get_current_user), # Заменяем request на current_user
     db: Session = Depends(get_db)
 ):
     """
     GET /teams/{team_id}/requests
     Получить список запросов на вступление в команду.
     Только капитан может.
+
+    Query параметры:
+    - status: фильтр по статусу (по умолчанию pending)
+    - cursor: курсор следующей страницы
+    - limit: лимит результатов (по умолчанию 20, макс 100)
+
+    Сортировка — от новых к старым. Если есть следующая страница,
+    ее курсор возвращается в заголовке X-Next-Cursor.
     """
     # current_user уже получен из JWT
 
@@ -552,8 +608,25 @@ def get_team_requests(
 
     check_user_is_captain(team, current_user)
 
-    requests = db.query(TeamRequest).filter(
-        TeamRequest.team_id == team_id
-    ).all()
+    # Индекс (team_id, status, created_at) покрывает фильтр и сортировку,
+    # пользователи заявок подгружаются одним батч-запросом
+    query = db.query(TeamRequest).options(
+        selectinload(TeamRequest.user)
+    ).filter(
+        and_(
+            TeamRequest.team_id == team_id,
+            TeamRequest.status == request_status
+        )
+    )
+
+    requests = paginate(
+        query,
+        id_column=TeamRequest.id,
+        sort_column=TeamRequest.created_at,
+        descending=True,
+        cursor=cursor,
+        limit=limit,
+        response=response,
+    )
 
-    return requests
\ No newline at end of file
+    return requests
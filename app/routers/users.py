@@ -1,59 +1,104 @@
 # app/routers/users.py
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query # Убираем Request из импортов
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import and_, func
+from fastapi.encoders import jsonable_encoder
+from starlette.concurrency import run_in_threadpool
+from datetime import datetime
+from typing import Dict, List, Optional
+import json
 from app.database import get_db
-from app.models import User, Skill, Role, Achievement
+from app.models import User, Role, Achievement, Team, normalize_username
 from app.schemas import (
     UserLogin,
     UserUpdate,
     UserResponse,
     UserListResponse,
+    AchievementCreate,
+    AchievementResponse,
+    UserImportResponse,
+    CurrentUser,
 )
-from app.utils.security import get_current_user # Импортируем новую зависимость
+from app.utils.security import get_current_user, get_current_user_row # Импортируем новую зависимость
+from app.utils.cache import invalidate_user, request_summary_cache, user_count_cache, user_profile_cache
+from app.utils.pagination import paginate
+from app.utils.http_cache import conditional_response, make_etag
+from app.utils.skills import resolve_skills, skill_catalog
+from app.utils.achievements import refresh_achievement_stats
+from app.utils.search import build_match_query, match_users, users_fts, users_fts_rank
+from app.utils.user_import import IMPORT_ADMIN_TG_IDS, IMPORT_FORMATS, UserImporter, iter_lines
 
 # ==================== РОУТЕР ====================
 
 router = APIRouter(prefix="/users", tags=["users"])
 
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+# Максимум пользователей в одном GET /users/batch
+MAX_BATCH_USERS = 100
+
+# Размер страницы достижений по умолчанию (только она кэшируется)
+ACHIEVEMENTS_PAGE_SIZE = 20
+
 
 # ==================== ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ====================
 
-def get_or_create_skill(db: Session, skill_name: str) -> Skill:
+def get_user_or_404(db: Session, user_id: int) -> User:
+    """Пользователь по ID или 404"""
+    user = db.query(User).filter(User.id == user_id).first()
+
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Пользователь с ID {user_id} не найден"
+        )
+
+    return user
+
+
+def cached_user_payload(request: Request, db: Session, user_id: int, kind: str, serialize) -> Response:
     """
-    Получить навык по названию, или создать новый если его нет.
+    Ответ профиля из user_profile_cache (с ETag / 304).
+    При промахе загружает пользователя и кэширует serialize(user, page) как JSON.
+    Заголовки, которые serialize выставил в page (X-Next-Cursor), кэшируются вместе с телом.
     """
-    skill = db.query(Skill).filter(Skill.name.ilike(skill_name)).first()
+    cached = user_profile_cache.get((user_id, kind))
+    if cached is None:
+        user = get_user_or_404(db, user_id)
+        page = Response()
+        body = json.dumps(jsonable_encoder(serialize(user, page)), ensure_ascii=False).encode()
+        headers = {name: value for name, value in page.headers.items() if name != "content-length"}
+        cached = (body, make_etag(body), headers)
+        user_profile_cache.set((user_id, kind), cached)
 
-    if not skill:
-        skill = Skill(name=skill_name)
-        db.add(skill)
-        db.commit()
-        db.refresh(skill)
+    body, etag, headers = cached
+    response = conditional_response(request, body, etag)
+    response.headers.update(headers)
+    return response
 
-    return skill
+
+def achievements_page(db: Session, user_id: int, limit: int, cursor: Optional[str], response: Response) -> List[Achievement]:
+    """Страница достижений пользователя по возрастанию id (keyset по индексу user_id)"""
+    query = db.query(Achievement).filter(Achievement.user_id == user_id)
+    return paginate(query, Achievement.id, limit, cursor=cursor, response=response)
 
 
 def update_user_skills(db: Session, user: User, skill_names: List[str]):
     """
     Обновить навыки пользователя.
     Принимает список названий навыков.
+
+    Навыки находятся одним запросом, недостающие создаются пачкой.
+    commit не делается — изменения уходят вместе с остальным профилем.
     """
     if not skill_names:
         return
 
-    # Очищаем старые навыки
-    user.skills.clear()
+    user.skills = resolve_skills(db, skill_names)
 
-    # Добавляем новые
-    for skill_name in skill_names:
-        skill = get_or_create_skill(db, skill_name)
-        if skill not in user.skills:
-            user.skills.append(skill)
-
-    db.commit()
+    # Связи M2M не меняют строку users — версию профиля обновляем явно
+    user.updated_at = datetime.utcnow()
 
 
 # ==================== АУТЕНТИФИКАЦИЯ ====================
@@ -79,6 +124,7 @@ def telegram_auth(user_data: UserLogin, db: Session = Depends(get_db)):
         user.full_name = user_data.full_name
         db.commit()
         db.refresh(user)
+        invalidate_user(user.id)
         return user
 
     # Создаем нового пользователя
@@ -98,13 +144,60 @@ def telegram_auth(user_data: UserLogin, db: Session = Depends(get_db)):
     return new_user
 
 
+# ==================== МАССОВЫЙ ИМПОРТ ====================
+
+@router.post("/import", response_model=UserImportResponse)
+async def import_users(
+    request: Request,
+    import_format: Optional[str] = Query(
+        None, alias="format", description="ndjson или csv (по умолчанию — по Content-Type)"
+    ),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """
+    POST /users/import
+    Массовый импорт участников из выгрузки регистрации (NDJSON или CSV в теле запроса).
+
+    - Пользователи обновляются или создаются по tg_id
+    - Навыки разрешаются одним запросом на пачку
+    - Достижения добавляются к пользователю
+    - Записи применяются пачками, каждая пачка — отдельная транзакция
+
+    Некорректные записи не прерывают импорт: они перечислены в errors с номером строки.
+    Доступно только организаторам (tg_id из IMPORT_ADMIN_TG_IDS).
+    """
+    if current_user.tg_id not in IMPORT_ADMIN_TG_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Импорт доступен только организаторам"
+        )
+
+    if import_format is None:
+        content_type = request.headers.get("content-type", "")
+        import_format = "csv" if "csv" in content_type else "ndjson"
+    if import_format not in IMPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Неизвестный формат: {import_format}. Допустимые: {', '.join(IMPORT_FORMATS)}"
+        )
+
+    importer = UserImporter(import_format)
+    async for line_no, line in iter_lines(request.stream()):
+        if importer.feed(line_no, line):
+            # Запись в БД — в пуле потоков, чтобы не блокировать event loop
+            await run_in_threadpool(importer.flush)
+    await run_in_threadpool(importer.flush)
+
+    return importer.result
+
+
 # ==================== ПРОФИЛЬ ====================
 
 # УБИРАЕМ Query параметр user_id, так как он теперь берётся из JWT
 @router.patch("/me", response_model=UserResponse)
 def update_profile(
     user_update: UserUpdate = None,
-    current_user: User = Depends(get_current_user), # Добавляем зависимость
+    current_user: User = Depends(get_current_user_row), # Добавляем зависимость
     db: Session = Depends(get_db)
 ):
     """
@@ -113,6 +206,8 @@ def update_profile(
 
     Параметры:
     - Тело запроса: bio, main_role, skills
+
+    Все изменения (включая навыки) сохраняются одной транзакцией.
     """
     # current_user уже получен из JWT
     user = current_user
@@ -141,6 +236,12 @@ def update_profile(
     db.commit()
     db.refresh(user)
 
+    # Новые навыки попадают в каталог только после commit
+    if user_update.skills:
+        skill_catalog.add_skills(user.skills)
+
+    invalidate_user(user.id)
+
     return user
 
 
@@ -148,23 +249,32 @@ def update_profile(
 
 @router.get("/", response_model=List[UserListResponse])
 def get_users(
+    response: Response,
     role: Optional[str] = Query(None, description="Фильтр по роли (backend, frontend, design, pm, analyst)"),
     hackathon_id: Optional[int] = Query(None, description="ID хакатона для фильтра"),
-    skip: int = Query(0, ge=0, description="Количество записей для пропуска"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (из заголовка X-Next-Cursor)"),
+    skip: int = Query(0, ge=0, deprecated=True, description="Устарело: используйте cursor"),
     limit: int = Query(10, ge=1, le=100, description="Максимум записей в ответе"),
+    with_total: bool = Query(False, description="Вернуть общее количество в заголовке X-Total-Count"),
     db: Session = Depends(get_db)
 ):
     """
     GET /users/
-    Получить список пользователей с фильтрами.
+    Получить список пользователей с фильтрами (по возрастанию id).
 
     Query параметры:
     - role: фильтр по роли
     - hackathon_id: получить участников хакатона
-    - skip: смещение
+    - cursor: курсор следующей страницы из заголовка X-Next-Cursor
+    - skip: устаревшее смещение, игнорируется при переданном cursor
     - limit: лимит результатов
+    - with_total: добавить X-Total-Count (кэшируется на минуту)
     """
-    query = db.query(User)
+    # Читаем только колонки UserListResponse, без bio и связей
+    query = db.query(
+        User.id, User.tg_id, User.username, User.full_name, User.main_role, User.team_id,
+        User.achievement_count, User.best_place,
+    )
 
     # Фильтр по роли
     if role:
@@ -179,22 +289,100 @@ def get_users(
 
     # Фильтр по хакатону (пользователи, которые уже в команде этого хакатона)
     if hackathon_id:
-        # JOIN с Team где hackathon_id совпадает и user_id совпадает
-        from app.models import Team
+        # JOIN с Team идет по индексам teams.hackathon_id (покрывает и id) и users.team_id
         query = query.join(Team, User.team_id == Team.id).filter(
             Team.hackathon_id == hackathon_id
         )
 
-    # Пагинация
-    users = query.offset(skip).limit(limit).all()
+    if with_total:
+        count_key = (role, hackathon_id)
+        total = user_count_cache.get(count_key)
+        if total is None:
+            total = query.with_entities(func.count(User.id)).scalar()
+            user_count_cache.set(count_key, total)
+        response.headers[TOTAL_COUNT_HEADER] = str(total)
+
+    # Keyset пагинация по id
+    return paginate(query, User.id, limit, cursor=cursor, response=response, offset=skip)
+
+
+# ==================== ПОЛНОТЕКСТОВЫЙ ПОИСК ====================
+
+# Объявлен до /{user_id}, иначе "search" попадет в user_id
+@router.get("/search", response_model=List[UserListResponse])
+def search_users(
+    q: str = Query(..., min_length=1, max_length=200, description="Слова для поиска в имени, username, bio и навыках"),
+    skip: int = Query(0, ge=0, le=1000, description="Количество записей для пропуска"),
+    limit: int = Query(20, ge=1, le=50, description="Максимум записей в ответе"),
+    db: Session = Depends(get_db)
+):
+    """
+    GET /users/search?q=
+    Найти пользователей по словам в full_name, username, bio и названиях навыков.
+
+    Поиск идет по FTS5-индексу users_fts (все слова обязательны, совпадение по
+    началу слова), результаты отсортированы по релевантности (bm25).
+    """
+    match_query = build_match_query(q)
+    if not match_query:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Запрос должен содержать хотя бы одно слово"
+        )
+
+    users = db.query(User).join(
+        users_fts, users_fts.c.rowid == User.id
+    ).filter(
+        match_users(match_query)
+    ).order_by(users_fts_rank, User.id).offset(skip).limit(limit).all()
 
     return users
 
 
+# ==================== ПАКЕТНОЕ ПОЛУЧЕНИЕ ====================
+
+# Объявлен до /{user_id}, иначе "batch" попадет в user_id
+@router.get("/batch", response_model=Dict[int, UserResponse])
+def get_users_batch(
+    ids: str = Query(..., description=f"ID пользователей через запятую (не больше {MAX_BATCH_USERS})"),
+    db: Session = Depends(get_db)
+):
+    """
+    GET /users/batch?ids=1,2,3
+    Получить несколько профилей за один запрос, в виде {id: профиль}.
+
+    Пользователи, навыки и достижения загружаются тремя запросами к БД
+    независимо от количества ID. Несуществующие ID в ответ не попадают.
+    """
+    try:
+        user_ids = {int(part) for part in ids.split(",") if part.strip()}
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ids должен быть списком целых чисел через запятую"
+        )
+
+    if not user_ids:
+        return {}
+
+    if len(user_ids) > MAX_BATCH_USERS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Не больше {MAX_BATCH_USERS} ID за запрос"
+        )
+
+    users = db.query(User).options(
+        selectinload(User.skills),
+        selectinload(User.achievements),
+    ).filter(User.id.in_(user_ids)).all()
+
+    return {user.id: user for user in users}
+
+
 # ==================== ДЕТАЛЬНАЯ ИНФОРМАЦИЯ ====================
 
 @router.get("/{user_id}", response_model=UserResponse)
-def get_user_detail(user_id: int, db: Session = Depends(get_db)):
+def get_user_detail(user_id: int, request: Request, db: Session = Depends(get_db)):
     """
     GET /users/{user_id}
     Получить детальную информацию о пользователе.
@@ -204,16 +392,15 @@ def get_user_detail(user_id: int, db: Session = Depends(get_db)):
     - Список навыков
     - Список достижений
     - Информацию о команде
-    """
-    user = db.query(User).filter(User.id == user_id).first()
 
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Пользователь с ID {user_id} не найден"
-        )
-
-    return user
+    Ответ отдается из кэша сериализованных профилей (user_profile_cache).
+    Cache-Control: no-cache. ETag — по содержимому; If-None-Match с тем же
+    ETag — 304.
+    """
+    return cached_user_payload(
+        request, db, user_id, "profile",
+        lambda user, _: UserResponse.from_orm(user),
+    )
 
 
 # ==================== ПОИСК ====================
@@ -239,9 +426,10 @@ def get_user_by_tg_id(tg_id: int, db: Session = Depends(get_db)):
 def get_user_by_username(username: str, db: Session = Depends(get_db)):
     """
     GET /users/search/by-username/{username}
-    Получить пользователя по username.
+    Получить пользователя по username (без учета регистра).
     """
-    user = db.query(User).filter(User.username.ilike(username)).first()
+    # Равенство по username_key идет по индексу, в отличие от ilike
+    user = db.query(User).filter(User.username_key == normalize_username(username)).first()
 
     if not user:
         raise HTTPException(
@@ -255,45 +443,58 @@ def get_user_by_username(username: str, db: Session = Depends(get_db)):
 # ==================== НАВЫКИ ====================
 
 @router.get("/{user_id}/skills", response_model=List[str])
-def get_user_skills(user_id: int, db: Session = Depends(get_db)):
+def get_user_skills(user_id: int, request: Request, db: Session = Depends(get_db)):
     """
     GET /users/{user_id}/skills
     Получить список навыков пользователя.
-    """
-    user = db.query(User).filter(User.id == user_id).first()
 
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Пользователь с ID {user_id} не найден"
-        )
-
-    return [skill.name for skill in user.skills]
+    Cache-Control: no-cache. Ответ кэшируется, ETag — по содержимому.
+    """
+    return cached_user_payload(
+        request, db, user_id, "skills",
+        lambda user, _: [skill.name for skill in user.skills],
+    )
 
 
 # ==================== ДОСТИЖЕНИЯ ====================
 
-@router.get("/{user_id}/achievements", response_model=List)
-def get_user_achievements(user_id: int, db: Session = Depends(get_db)):
+@router.get("/{user_id}/achievements", response_model=List[AchievementResponse])
+def get_user_achievements(
+    user_id: int,
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (из заголовка X-Next-Cursor)"),
+    limit: int = Query(ACHIEVEMENTS_PAGE_SIZE, ge=1, le=100, description="Максимум записей в ответе"),
+    db: Session = Depends(get_db)
+):
     """
     GET /users/{user_id}/achievements
-    Получить список всех достижений пользователя.
-    """
-    user = db.query(User).filter(User.id == user_id).first()
+    Получить достижения пользователя (по возрастанию id, постранично).
 
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Пользователь с ID {user_id} не найден"
+    Следующая страница — по курсору из заголовка X-Next-Cursor.
+    Количество достижений и лучшее место есть в профиле
+    (achievement_count, best_place).
+
+    Первая страница с limit по умолчанию кэшируется, Cache-Control: no-cache,
+    ETag — по содержимому.
+    """
+    if cursor is None and limit == ACHIEVEMENTS_PAGE_SIZE:
+        return cached_user_payload(
+            request, db, user_id, "achievements",
+            lambda user, page: [
+                AchievementResponse.from_orm(a)
+                for a in achievements_page(db, user.id, limit, None, page)
+            ],
         )
 
-    return user.achievements
+    get_user_or_404(db, user_id)
+    return achievements_page(db, user_id, limit, cursor, response)
 
 
 @router.post("/{user_id}/achievements", status_code=status.HTTP_201_CREATED)
 def add_achievement(
     user_id: int,
-    achievement_data: dict,
+    achievement_data: AchievementCreate,
     db: Session = Depends(get_db)
 ):
     """
@@ -318,20 +519,26 @@ def add_achievement(
 
     achievement = Achievement(
         user_id=user_id,
-        **achievement_data
+        **achievement_data.dict()
     )
 
+    # Достижения входят в профиль — обновляем его версию
+    user.updated_at = datetime.utcnow()
+
     db.add(achievement)
+    refresh_achievement_stats(db, [user_id])
     db.commit()
     db.refresh(achievement)
 
+    invalidate_user(user_id)
+
     return achievement
 
 
 # ==================== УДАЛЕНИЕ ====================
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_user(user_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)): # Добавляем current_user
+def delete_user(user_id: int, current_user: CurrentUser = Depends(get_current_user), db: Session = Depends(get_db)): # Добавляем current_user
     """
     DELETE /users/{user_id}
     Удалить пользователя. (Требуется аутентификация, упрощённая проверка)
@@ -351,5 +558,23 @@ def delete_user(user_id: int, current_user: User = Depends(get_current_user), db
             detail=f"Пользователь с ID {user_id} не найден"
         )
 
+    # Команды, где он капитан, не должны исчезать вместе с ним: капитаном
+    # становится участник с наименьшим id. Команды без других участников
+    # удаляются вместе с пользователем (teams.captain_id ON DELETE CASCADE).
+    for team in db.query(Team).filter(Team.captain_id == user_id).all():
+        successor_id = db.query(func.min(User.id)).filter(
+            User.team_id == team.id, User.id != user_id
+        ).scalar()
+        if successor_id is not None:
+            team.captain_id = successor_id
+
+    # Остальное делает БД через ON DELETE: навыки (user_skills), достижения,
+    # заявки в команды и личные запросы (включая архив) удаляются каскадно.
+    # ORM не загружает их в память
     db.delete(user)
-    db.commit()
\ No newline at end of file
+    db.commit()
+
+    invalidate_user(user_id)
+
+    # Вместе с ним каскадно удалены запросы — счетчики затронутых пользователей устарели
+    request_summary_cache.clear()
\ No newline at end of file
@@ -48,6 +48,16 @@ class SkillResponse(BaseModel):
         from_attributes = True
 
 
+class AchievementCreate(BaseModel):
+    """Схема для добавления достижения"""
+    hackathon_name: str
+    place: Optional[int] = None
+    team_name: str
+    project_link: Optional[str] = None
+    year: int
+    description: str = ""
+
+
 class AchievementResponse(BaseModel):
     """Схема для ответа с достижением"""
     id: int
@@ -75,6 +85,8 @@ class UserResponse(BaseModel):
     created_at: datetime
     skills: List[SkillResponse] = []
     achievements: List[AchievementResponse] = []
+    achievement_count: Optional[int] = 0
+    best_place: Optional[int] = None
     
     class Config:
         from_attributes = True
@@ -88,11 +100,51 @@ class UserListResponse(BaseModel):
     full_name: str
     main_role: Optional[str]
     team_id: Optional[int]
+    achievement_count: Optional[int] = 0
+    best_place: Optional[int] = None
     
     class Config:
         from_attributes = True
 
 
+class CurrentUser(BaseModel):
+    """Снимок аутентифицированного пользователя (кэшируется по токену, только для чтения)"""
+    id: int
+    tg_id: int
+    username: Optional[str]
+    full_name: str
+    team_id: Optional[int]
+    
+    class Config:
+        from_attributes = True
+        frozen = True
+
+
+class UserImportRecord(UserLogin):
+    """Запись массового импорта: данные логина + профиль + достижения"""
+    bio: Optional[str] = None
+    main_role: Optional[RoleEnum] = None
+    ready_to_work: Optional[bool] = None
+    skills: Optional[List[str]] = None  # None — не трогать навыки существующего пользователя
+    achievements: List[AchievementCreate] = []
+
+
+class UserImportError(BaseModel):
+    """Ошибка в одной записи импорта"""
+    line: int
+    tg_id: Optional[int] = None
+    detail: str
+
+
+class UserImportResponse(BaseModel):
+    """Итог массового импорта"""
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    achievements_added: int = 0
+    errors: List[UserImportError] = []  # Первые MAX_REPORTED_ERRORS ошибок
+
+
 class UserCreateOld(BaseModel):
     """Модель для создания пользователя (старая версия)"""
     name: str
@@ -166,6 +218,18 @@ class NotificationResponse(BaseModel):
     hackathon_id: Optional[int] = None
 
 
+class HackathonDashboardResponse(BaseModel):
+    """Сводка по хакатону для организаторов"""
+    hackathon_id: int
+    teams_total: int = 0
+    teams_looking: int = 0
+    participants_total: int = 0
+    participants_by_role: Dict[str, int] = {}  # Участники без роли — под ключом "none"
+    pending_requests: Dict[str, int] = {}  # pending-запросы по типам
+    pending_team_requests: int = 0  # pending-заявки и приглашения в команды
+    generated_at: datetime
+
+
 # ==================== TEAM СХЕМЫ ====================
 
 class TeamCreate(BaseModel):
@@ -245,6 +309,7 @@ class RequestStatusEnum(str, Enum):
     accepted = "accepted"
     declined = "declined"
     canceled = "canceled"
+    expired = "expired"
 
 
 class RequestCreate(BaseModel):
@@ -278,6 +343,54 @@ class RequestResponse(BaseModel):
         from_attributes = True
 
 
+class RequestListItem(BaseModel):
+    """
+    Запрос в списках /requests/sent и /requests/received (разреженный ответ):
+    всегда есть id, плоские поля — только перечисленные в fields (по умолчанию
+    все), вложенные sender/receiver/team — только перечисленные в expand
+    """
+    id: int
+    sender_id: Optional[int] = None
+    receiver_id: Optional[int] = None
+    team_id: Optional[int] = None
+    request_type: Optional[str] = None
+    status: Optional[str] = None
+    hackathon_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    sender: Optional['UserResponse'] = None
+    receiver: Optional['UserResponse'] = None
+    team: Optional['TeamResponse'] = None
+
+
+class BulkInviteCreate(BaseModel):
+    """Схема для массовой отправки приглашений в команду"""
+    hackathon_id: int
+    team_id: int
+    receiver_ids: List[int]
+
+
+class BulkInviteResult(BaseModel):
+    """Результат приглашения одного пользователя"""
+    receiver_id: int
+    created: bool
+    request_id: Optional[int] = None
+    detail: Optional[str] = None  # Причина, если приглашение не создано
+
+
+class BulkInviteResponse(BaseModel):
+    """Ответ на массовую отправку приглашений"""
+    results: List[BulkInviteResult]
+    created_count: int
+
+
+class RequestSummaryResponse(BaseModel):
+    """Счетчики pending-запросов по типам (для бейджей)"""
+    sent: Dict[str, int]
+    received: Dict[str, int]
+    total_sent: int = 0
+    total_received: int = 0
+
+
 # ==================== RECOMMENDATIONS СХЕМЫ ====================
 
 class RecommendationRequest(BaseModel):
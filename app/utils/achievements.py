@@ -0,0 +1,63 @@
+"""
+Статистика достижений пользователя.
+
+Количество достижений и лучшее место хранятся прямо в users
+(User.achievement_count, User.best_place), чтобы карточки профиля и скоринг
+рекомендаций читали колонку, а не загружали строки achievements.
+Колонки пересчитываются одним UPDATE с подзапросами при каждом изменении
+достижений; commit делает вызывающий код.
+"""
+from typing import Iterable
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.database import engine
+from app.models import Achievement, User
+
+
+def achievement_stats_values() -> dict:
+    """Значения для UPDATE users: коррелированные подзапросы по achievements"""
+    return {
+        User.achievement_count: select(func.count(Achievement.id)).where(
+            Achievement.user_id == User.id
+        ).scalar_subquery(),
+        User.best_place: select(func.min(Achievement.place)).where(
+            Achievement.user_id == User.id
+        ).scalar_subquery(),
+    }
+
+
+def refresh_achievement_stats(db: Session, user_ids: Iterable[int]) -> None:
+    """
+    Пересчитать achievement_count и best_place у указанных пользователей.
+    Несохраненные достижения сначала отправляются в БД (flush).
+    """
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return
+    db.flush()
+    db.execute(
+        update(User).where(User.id.in_(user_ids)).values(achievement_stats_values()),
+        execution_options={"synchronize_session": "fetch"},
+    )
+
+
+def backfill_achievement_stats(batch_size: int = 1000) -> int:
+    """
+    Заполнить статистику у пользователей, созданных до появления колонок
+    (achievement_count IS NULL). Возвращает количество обновленных строк.
+    """
+    pending = select(User.id).where(User.achievement_count.is_(None)).limit(batch_size)
+
+    total = 0
+    while True:
+        with engine.begin() as connection:
+            ids = connection.execute(pending).scalars().all()
+            if ids:
+                connection.execute(
+                    update(User).where(User.id.in_(ids)).values(achievement_stats_values())
+                )
+        total += len(ids)
+        if len(ids) < batch_size:
+            return total
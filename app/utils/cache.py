@@ -0,0 +1,164 @@
+"""
+Простые in-process кэши.
+
+Кэши живут в памяти одного процесса uvicorn и сбрасываются при рестарте,
+поэтому в них кладется только то, что можно пересчитать из БД. Каждый кэш
+регистрируется по имени — это нужно для сбора статистики попаданий.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+# Все созданные кэши по имени (для статистики)
+CACHES: Dict[str, "TTLCache"] = {}
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Потокобезопасный LRU-кэш с ограничением размера и опциональным TTL.
+
+    - maxsize: максимум записей, самые старые по использованию вытесняются
+    - ttl: время жизни записи в секундах (None = до явной инвалидации)
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        CACHES[name] = self
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Получить значение или default, если записи нет или она устарела"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Положить значение в кэш.
+        ttl переопределяет время жизни по умолчанию для этой записи.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        """Удалить запись (инвалидация)"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Сбросить весь кэш"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        """Размер и статистика попаданий"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+# ==================== КЭШИ ПРИЛОЖЕНИЯ ====================
+
+# Счетчики pending-запросов для бейджей (GET /requests/summary), ключ — user_id.
+# Инвалидируются на каждой записи в requests; TTL — страховка от пропущенной инвалидации.
+request_summary_cache = TTLCache("request_summary", maxsize=10_000, ttl=300)
+
+
+def invalidate_request_summary(*user_ids: Optional[int]) -> None:
+    """Сбросить счетчики запросов для указанных пользователей"""
+    for user_id in user_ids:
+        if user_id is not None:
+            request_summary_cache.pop(user_id)
+
+
+# Сериализованный календарь хакатонов (GET /hackathons/calendar/view),
+# ключ — (upcoming_limit, history_limit), значение — (body, etag).
+# Запись живет до ближайшего start_date (тогда хакатон переходит в историю)
+# или до любого изменения хакатонов.
+hackathon_calendar_cache = TTLCache("hackathon_calendar", maxsize=64, ttl=3600)
+
+# Ближайший хакатон для уведомления (GET /hackathons/notifications/check_upcoming):
+# одна запись (hackathon_id, title, start_date), живет до следующей границы окна
+upcoming_notification_cache = TTLCache("upcoming_notification", maxsize=1, ttl=3600)
+
+# Готовые уведомления, ключ — (hackathon_id, hours_left)
+notification_message_cache = TTLCache("notification_messages", maxsize=256)
+
+
+# Сводка по хакатону (GET /hackathons/{id}/dashboard), ключ — hackathon_id.
+# Считается из команд, участников и запросов, поэтому не инвалидируется
+# на каждой записи, а живет короткий TTL.
+hackathon_dashboard_cache = TTLCache("hackathon_dashboard", maxsize=256, ttl=30)
+
+
+# Количество пользователей для X-Total-Count (GET /users/), ключ — (role, hackathon_id).
+# Точность до минуты достаточна для счетчика в интерфейсе.
+user_count_cache = TTLCache("user_count", maxsize=1024, ttl=60)
+
+
+# Сериализованные ответы профиля, ключ — (user_id, вид), вид — USER_PAYLOAD_KINDS,
+# значение — (body, etag). Инвалидируются на каждой записи, меняющей профиль
+# (включая членство в командах: team_id входит в ответ); TTL — страховка.
+user_profile_cache = TTLCache("user_profile", maxsize=10_000, ttl=600)
+
+USER_PAYLOAD_KINDS = ("profile", "skills", "achievements")
+
+
+# Аутентификация (get_current_user): проверенный JWT -> user_id, запись живет
+# не дольше срока действия токена. Инвалидация не нужна: если пользователя
+# удалили, промах в auth_user_cache вернет 401.
+auth_token_cache = TTLCache("auth_token", maxsize=10_000, ttl=300)
+
+# Снимок пользователя (CurrentUser) для зависимостей, ключ — user_id.
+# Инвалидируется вместе с профилем (invalidate_user).
+auth_user_cache = TTLCache("auth_user", maxsize=10_000, ttl=60)
+
+
+def invalidate_user(*user_ids: Optional[int]) -> None:
+    """Сбросить закэшированные ответы профиля и снимки для указанных пользователей"""
+    for user_id in user_ids:
+        if user_id is not None:
+            for kind in USER_PAYLOAD_KINDS:
+                user_profile_cache.pop((user_id, kind))
+            auth_user_cache.pop(user_id)
+
+
+def invalidate_all_users() -> None:
+    """Сбросить профили и снимки всех пользователей (массовые изменения в БД)"""
+    user_profile_cache.clear()
+    auth_user_cache.clear()
+
+
+def invalidate_hackathons() -> None:
+    """Сбросить все производные от списка хакатонов кэши"""
+    hackathon_calendar_cache.clear()
+    upcoming_notification_cache.clear()
+    notification_message_cache.clear()
+    hackathon_dashboard_cache.clear()
@@ -0,0 +1,93 @@
+"""
+In-process pub/sub для push-уведомлений (Server-Sent Events).
+
+Роутеры публикуют события после commit, SSE-эндпоинт подписывает
+пользователя и отдает ему события из собственной очереди. Очередь каждого
+подписчика ограничена: если клиент не успевает читать, самые старые
+события выбрасываются, а не копятся в памяти.
+"""
+import asyncio
+import itertools
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Set
+
+# Максимум событий в очереди одного подписчика
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class Subscription:
+    """Одно SSE-подключение пользователя"""
+
+    def __init__(self, user_id: int, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def _put(self, event: dict) -> None:
+        """Положить событие в очередь (выполняется в event loop подписчика)"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    def push(self, event: dict) -> None:
+        """Передать событие подписчику. Можно вызывать из любого потока."""
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # Event loop подписчика уже закрыт — подключение умерло
+            pass
+
+
+class EventBroker:
+    """Реестр подписок по user_id"""
+
+    def __init__(self):
+        self._subscriptions: Dict[int, Set[Subscription]] = defaultdict(set)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def subscribe(self, user_id: int) -> Subscription:
+        """Подписать пользователя (вызывать внутри event loop)"""
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Отписать подключение"""
+        with self._lock:
+            user_subscriptions = self._subscriptions.get(subscription.user_id)
+            if user_subscriptions is None:
+                return
+            user_subscriptions.discard(subscription)
+            if not user_subscriptions:
+                del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_ids: Iterable[Optional[int]], event_type: str, data: dict) -> None:
+        """Отправить событие всем подключениям указанных пользователей"""
+        event = {
+            "id": next(self._ids),
+            "type": event_type,
+            "data": data,
+            "sent_at": datetime.utcnow().isoformat(),
+        }
+        with self._lock:
+            targets = [
+                subscription
+                for user_id in set(user_ids) if user_id is not None
+                for subscription in self._subscriptions.get(user_id, ())
+            ]
+        for subscription in targets:
+            subscription.push(event)
+
+    def subscriber_count(self) -> int:
+        """Количество активных подключений"""
+        with self._lock:
+            return sum(len(subs) for subs in self._subscriptions.values())
+
+
+broker = EventBroker()
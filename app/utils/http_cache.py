@@ -0,0 +1,127 @@
+"""
+Условные GET-запросы (ETag / Last-Modified).
+
+Валидатор считается до сериализации: либо по версии строки (id, updated_at
+и т.п.), либо по уже закэшированному телу. Если клиент прислал тот же ETag
+в If-None-Match (или Last-Modified не новее If-Modified-Since), возвращается
+пустой 304 — тело не сериализуется и не передается повторно.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+# ==================== CACHE-CONTROL ====================
+
+# Клиент может хранить ответ, но обязан перепроверять его через ETag
+CACHE_CONTROL = "no-cache"
+
+# Публичные справочные данные (хакатоны): минуту без перепроверки
+CACHE_CONTROL_PUBLIC = "public, max-age=60"
+
+
+# ==================== ВАЛИДАТОРЫ ====================
+
+def make_etag(body: bytes) -> str:
+    """Сильный ETag по содержимому тела ответа"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def make_version_etag(*parts) -> str:
+    """
+    Слабый ETag по версии данных (id, updated_at, ...), без сериализации тела.
+    Слабый, потому что одинаковая версия гарантирует то же содержимое,
+    но не побайтно то же представление.
+    """
+    raw = "|".join(str(part) for part in parts).encode()
+    return 'W/"' + hashlib.blake2b(raw, digest_size=16).hexdigest() + '"'
+
+
+def format_http_date(value: datetime) -> str:
+    """datetime (UTC, naive) -> HTTP-дата для Last-Modified"""
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Совпадает ли ETag с одним из перечисленных в If-None-Match"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Слабое сравнение: W/"x" и "x" считаются одним и тем же представлением
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def not_modified_since(request: Request, last_modified: datetime) -> bool:
+    """Last-Modified не новее If-Modified-Since (с точностью до секунды)"""
+    header = request.headers.get("if-modified-since")
+    if not header:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    Актуальна ли версия клиента.
+    If-None-Match приоритетнее If-Modified-Since (RFC 9110).
+    """
+    if request.headers.get("if-none-match"):
+        return etag_matches(request, etag)
+    if last_modified is not None:
+        return not_modified_since(request, last_modified)
+    return False
+
+
+# ==================== ОТВЕТЫ ====================
+
+def validator_headers(
+    etag: str,
+    last_modified: Optional[datetime] = None,
+    cache_control: str = CACHE_CONTROL,
+) -> dict:
+    """Заголовки ETag / Last-Modified / Cache-Control"""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_http_date(last_modified)
+    return headers
+
+
+def check_conditional(
+    request: Request,
+    response: Response,
+    etag: str,
+    last_modified: Optional[datetime] = None,
+    cache_control: str = CACHE_CONTROL,
+) -> Optional[Response]:
+    """
+    Проставить валидаторы в ответ эндпоинта.
+    Возвращает готовый 304, если у клиента актуальная версия, иначе None.
+    """
+    headers = validator_headers(etag, last_modified, cache_control)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+def conditional_response(
+    request: Request,
+    body: bytes,
+    etag: str,
+    cache_control: str = CACHE_CONTROL,
+) -> Response:
+    """JSON-ответ из готового тела с ETag или 304, если у клиента уже актуальная версия"""
+    headers = validator_headers(etag, cache_control=cache_control)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,286 @@
+"""
+Фоновые задачи обслуживания БД.
+
+Задачи работают короткими батчами: каждый батч — отдельная транзакция,
+поэтому SQLite не держит блокировку на запись дольше одного батча и
+обычные запросы API успевают проходить между ними.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import DateTime, delete, func, insert, literal, or_, select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.database import BackgroundSessionLocal, engine, rebuild_with_autoincrement
+from app.models import Hackathon, Request, RequestArchive, RequestStatus, Team, TeamRequest
+from app.utils.cache import request_summary_cache
+from app.utils.skills import skill_catalog
+
+logger = logging.getLogger(__name__)
+
+# ==================== НАСТРОЙКИ ====================
+
+# Через сколько дней pending-запрос истекает, даже если хакатон еще идет
+REQUEST_TTL_DAYS = int(os.getenv("REQUEST_TTL_DAYS", "14"))
+
+# Через сколько дней после завершения запрос переносится в архив
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+
+# Сколько строк обрабатывать за одну транзакцию
+MAINTENANCE_BATCH_SIZE = int(os.getenv("MAINTENANCE_BATCH_SIZE", "500"))
+
+# Как часто запускать обслуживание (секунды)
+MAINTENANCE_INTERVAL_SECONDS = int(os.getenv("MAINTENANCE_INTERVAL_SECONDS", "600"))
+
+
+# ==================== ИСТЕЧЕНИЕ ЗАПРОСОВ ====================
+
+def expire_in_batches(db: Session, model, stale_ids_query, now: datetime, batch_size: int) -> int:
+    """Перевести найденные запросы в expired батчами, каждый батч — своя транзакция"""
+    total = 0
+    while True:
+        ids = db.execute(stale_ids_query.limit(batch_size)).scalars().all()
+        if not ids:
+            break
+
+        values = {model.status: RequestStatus.expired}
+        if hasattr(model, "updated_at"):
+            values[model.updated_at] = now
+        db.query(model).filter(model.id.in_(ids)).update(values, synchronize_session=False)
+        db.commit()
+
+        total += len(ids)
+        if len(ids) < batch_size:
+            break
+    return total
+
+
+def expire_stale_requests(
+    db: Session,
+    now: Optional[datetime] = None,
+    ttl_days: int = REQUEST_TTL_DAYS,
+    batch_size: int = MAINTENANCE_BATCH_SIZE,
+) -> int:
+    """
+    Перевести в expired зависшие pending-запросы (Request и TeamRequest):
+    - хакатон прошел registration_deadline или end_date
+    - или запрос старше ttl_days
+
+    Возвращает количество истекших запросов.
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=ttl_days)
+
+    stale_requests = select(Request.id).join(
+        Hackathon, Hackathon.id == Request.hackathon_id
+    ).where(
+        Request.status == RequestStatus.pending,
+        or_(
+            Hackathon.registration_deadline < now,
+            Hackathon.end_date < now,
+            Request.created_at < cutoff,
+        ),
+    )
+
+    stale_team_requests = select(TeamRequest.id).join(
+        Team, Team.id == TeamRequest.team_id
+    ).join(
+        Hackathon, Hackathon.id == Team.hackathon_id
+    ).where(
+        TeamRequest.status == RequestStatus.pending,
+        or_(
+            Hackathon.registration_deadline < now,
+            Hackathon.end_date < now,
+            TeamRequest.created_at < cutoff,
+        ),
+    )
+
+    expired = expire_in_batches(db, Request, stale_requests, now, batch_size)
+    expired += expire_in_batches(db, TeamRequest, stale_team_requests, now, batch_size)
+
+    if expired:
+        # Счетчики pending-запросов поменялись у неизвестного набора пользователей
+        request_summary_cache.clear()
+
+    return expired
+
+
+def expire_duplicate_pending_requests(db: Session, now: Optional[datetime] = None) -> int:
+    """
+    Перевести в expired дубликаты pending-запросов, оставив самый ранний
+    в каждой группе. Дубликаты могли появиться до уникальных индексов
+    uq_requests_pending / uq_team_requests_pending (старая проверка была
+    подвержена гонкам), и без этого индексы не создаются. Вызывается при
+    старте до create_missing_indexes; когда индексы уже есть, ничего не находит.
+
+    Возвращает количество истекших запросов.
+    """
+    now = now or datetime.utcnow()
+
+    # Группы повторяют колонки уникальных индексов (NULL -> 0, как в coalesce индекса)
+    keep_requests = select(func.min(Request.id)).where(
+        Request.status == RequestStatus.pending
+    ).group_by(
+        Request.sender_id,
+        func.coalesce(Request.receiver_id, 0),
+        func.coalesce(Request.team_id, 0),
+        Request.request_type,
+        Request.hackathon_id,
+    )
+    keep_team_requests = select(func.min(TeamRequest.id)).where(
+        TeamRequest.status == RequestStatus.pending
+    ).group_by(TeamRequest.user_id, TeamRequest.team_id)
+
+    expired = db.execute(
+        update(Request).where(
+            Request.status == RequestStatus.pending,
+            Request.id.not_in(keep_requests),
+        ).values(status=RequestStatus.expired, updated_at=now),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+    expired += db.execute(
+        update(TeamRequest).where(
+            TeamRequest.status == RequestStatus.pending,
+            TeamRequest.id.not_in(keep_team_requests),
+        ).values(status=RequestStatus.expired),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+    db.commit()
+
+    if expired:
+        request_summary_cache.clear()
+
+    return expired
+
+
+def migrate_request_ids() -> int:
+    """
+    Перевести requests на AUTOINCREMENT (миграция при старте).
+
+    До этого SQLite выдавал новым запросам id, уже занятые в requests_archive
+    (max(id) + 1 после переноса последних строк в архив). Такие строки
+    получают новые id, а счетчик AUTOINCREMENT начинается выше всех id архива,
+    иначе перенос в архив падает на UNIQUE requests_archive.id.
+
+    Возвращает количество перенумерованных запросов.
+    """
+    if engine.dialect.name != "sqlite":
+        return 0
+    rebuild_with_autoincrement(Request.__table__)
+
+    with engine.begin() as connection:
+        last_id = max(
+            connection.execute(select(func.max(Request.id))).scalar() or 0,
+            connection.execute(select(func.max(RequestArchive.id))).scalar() or 0,
+        )
+
+        colliding = connection.execute(
+            select(Request.id).where(Request.id.in_(select(RequestArchive.id))).order_by(Request.id)
+        ).scalars().all()
+        for request_id in colliding:
+            last_id += 1
+            connection.execute(
+                update(Request).where(Request.id == request_id).values(id=last_id, updated_at=Request.updated_at)
+            )
+
+        # Следующий id — строго больше всех id в обеих таблицах
+        sequence = connection.exec_driver_sql(
+            "SELECT seq FROM sqlite_sequence WHERE name = ?", (Request.__tablename__,)
+        ).scalar()
+        if sequence is None:
+            connection.exec_driver_sql(
+                "INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (Request.__tablename__, last_id)
+            )
+        elif sequence < last_id:
+            connection.exec_driver_sql(
+                "UPDATE sqlite_sequence SET seq = ? WHERE name = ?", (last_id, Request.__tablename__)
+            )
+
+    return len(colliding)
+
+
+# ==================== АРХИВАЦИЯ ====================
+
+# Колонки, которые копируются из requests в requests_archive
+ARCHIVED_COLUMNS = [
+    "id", "sender_id", "receiver_id", "team_id", "hackathon_id",
+    "request_type", "status", "created_at", "updated_at",
+]
+
+
+def archive_resolved_requests(
+    db: Session,
+    now: Optional[datetime] = None,
+    older_than_days: int = ARCHIVE_AFTER_DAYS,
+    batch_size: int = MAINTENANCE_BATCH_SIZE,
+) -> int:
+    """
+    Перенести завершенные (не pending) запросы старше older_than_days
+    из requests в requests_archive. Каждый батч — INSERT ... SELECT и DELETE
+    в одной транзакции.
+
+    Возвращает количество перенесенных запросов.
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=older_than_days)
+
+    resolved = select(Request.id).where(
+        Request.status != RequestStatus.pending,
+        Request.updated_at < cutoff,
+    ).limit(batch_size)
+
+    total = 0
+    while True:
+        ids = db.execute(resolved).scalars().all()
+        if not ids:
+            break
+
+        columns = [getattr(Request, name) for name in ARCHIVED_COLUMNS]
+        db.execute(
+            insert(RequestArchive).from_select(
+                ARCHIVED_COLUMNS + ["archived_at"],
+                select(*columns, literal(now, DateTime)).where(Request.id.in_(ids)),
+            )
+        )
+        db.execute(delete(Request).where(Request.id.in_(ids)))
+        db.commit()
+
+        total += len(ids)
+        if len(ids) < batch_size:
+            break
+    return total
+
+
+# ==================== ПЛАНИРОВЩИК ====================
+
+def run_maintenance() -> None:
+    """
+    Один проход всех задач обслуживания (синхронно, в отдельной сессии
+    на background_engine: батчи не делят коннекцию с запросами API)
+    """
+    db = BackgroundSessionLocal()
+    try:
+        expired = expire_stale_requests(db)
+        if expired:
+            logger.info(f"✓ Истекло pending-запросов: {expired}")
+        archived = archive_resolved_requests(db)
+        if archived:
+            logger.info(f"✓ Перенесено в архив запросов: {archived}")
+        # Навыки могли добавить в обход API (например, через админку)
+        skill_catalog.load(db)
+    finally:
+        db.close()
+
+
+async def maintenance_loop(interval: int = MAINTENANCE_INTERVAL_SECONDS) -> None:
+    """Периодически запускать обслуживание, не блокируя event loop"""
+    while True:
+        try:
+            await run_in_threadpool(run_maintenance)
+        except Exception as e:
+            logger.error(f"✗ Ошибка фонового обслуживания: {e}", exc_info=True)
+        await asyncio.sleep(interval)
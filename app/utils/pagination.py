@@ -0,0 +1,92 @@
+"""
+Keyset (cursor) пагинация для списочных эндпоинтов.
+
+Курсор — непрозрачная строка, в которой закодированы значение колонки
+сортировки и id последней отданной записи. Следующая страница начинается
+строго после этой пары, поэтому запрос идет по индексу и не сканирует
+пропущенные строки, как это делает OFFSET.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import and_, or_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort_value: Optional[datetime], row_id: int) -> str:
+    """Закодировать позицию (значение сортировки, id) в курсор"""
+    payload = [sort_value.isoformat() if sort_value is not None else None, row_id]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    """Раскодировать курсор. Некорректный курсор — 400."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_raw, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        sort_value = datetime.fromisoformat(sort_raw) if sort_raw is not None else None
+        return sort_value, int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный cursor"
+        )
+
+
+def paginate(
+    query,
+    id_column,
+    limit: int,
+    cursor: Optional[str] = None,
+    sort_column=None,
+    descending: bool = False,
+    response: Optional[Response] = None,
+    offset: int = 0,
+) -> List[Any]:
+    """
+    Применить keyset пагинацию к запросу.
+
+    Сортирует по (sort_column, id_column) — или только по id_column, если
+    sort_column не задана, — отдает не больше limit строк и, если есть
+    следующая страница, кладет курсор в заголовок X-Next-Cursor.
+    Работает и с ORM-объектами, и с проекциями колонок.
+
+    offset — совместимость со старыми клиентами на skip; с cursor игнорируется.
+    """
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor)
+        if sort_column is None:
+            query = query.filter(id_column < last_id if descending else id_column > last_id)
+        elif descending:
+            query = query.filter(or_(
+                sort_column < sort_value,
+                and_(sort_column == sort_value, id_column < last_id),
+            ))
+        else:
+            query = query.filter(or_(
+                sort_column > sort_value,
+                and_(sort_column == sort_value, id_column > last_id),
+            ))
+
+    order = [sort_column, id_column] if sort_column is not None else [id_column]
+    query = query.order_by(*[c.desc() if descending else c.asc() for c in order])
+
+    if offset and not cursor:
+        query = query.offset(offset)
+
+    # Берем на одну строку больше, чтобы понять, есть ли следующая страница
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if has_more and response is not None:
+        last = rows[-1]
+        sort_value = getattr(last, sort_column.key) if sort_column is not None else None
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(sort_value, getattr(last, id_column.key))
+
+    return rows
@@ -0,0 +1,114 @@
+"""
+Полнотекстовый поиск пользователей (SQLite FTS5).
+
+users_fts — виртуальная таблица с rowid = users.id и колонками full_name,
+username, bio, skills (названия навыков через пробел). Синхронизируется
+триггерами на users и user_skills, поэтому роутерам не нужно о ней помнить.
+"""
+import re
+from typing import Optional
+
+from sqlalchemy import column, literal_column, table, text
+
+from app.database import engine
+
+# Вес колонок в bm25: совпадение в имени и навыках важнее, чем в bio
+FTS_WEIGHTS = "10.0, 10.0, 1.0, 5.0"  # full_name, username, bio, skills
+
+users_fts = table("users_fts", column("rowid"))
+
+# Ранг совпадения: чем меньше, тем релевантнее
+users_fts_rank = literal_column(f"bm25(users_fts, {FTS_WEIGHTS})")
+
+# Навыки пользователя одной строкой
+SKILLS_OF = """
+    coalesce((
+        SELECT group_concat(skills.name, ' ')
+        FROM user_skills JOIN skills ON skills.id = user_skills.skill_id
+        WHERE user_skills.user_id = {user_id}
+    ), '')
+"""
+
+USER_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+        full_name, username, bio, skills,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN
+        INSERT INTO users_fts (rowid, full_name, username, bio, skills)
+        VALUES (new.id, new.full_name, coalesce(new.username, ''), coalesce(new.bio, ''), '');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE OF full_name, username, bio ON users BEGIN
+        UPDATE users_fts
+        SET full_name = new.full_name, username = coalesce(new.username, ''), bio = coalesce(new.bio, '')
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN
+        DELETE FROM users_fts WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS users_fts_skill_add AFTER INSERT ON user_skills BEGIN
+        UPDATE users_fts SET skills = {SKILLS_OF.format(user_id="new.user_id")}
+        WHERE rowid = new.user_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS users_fts_skill_remove AFTER DELETE ON user_skills BEGIN
+        UPDATE users_fts SET skills = {SKILLS_OF.format(user_id="old.user_id")}
+        WHERE rowid = old.user_id;
+    END
+    """,
+]
+
+USER_SEARCH_REBUILD = [
+    "DELETE FROM users_fts",
+    f"""
+    INSERT INTO users_fts (rowid, full_name, username, bio, skills)
+    SELECT users.id, users.full_name, coalesce(users.username, ''), coalesce(users.bio, ''),
+           {SKILLS_OF.format(user_id="users.id")}
+    FROM users
+    """,
+]
+
+
+def init_user_search() -> None:
+    """
+    Создать users_fts и триггеры, если их нет, и заполнить индекс,
+    если он расходится с таблицей users (первый запуск на старой БД).
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    with engine.begin() as connection:
+        for ddl in USER_SEARCH_DDL:
+            connection.exec_driver_sql(ddl)
+
+        indexed = connection.exec_driver_sql("SELECT count(*) FROM users_fts").scalar()
+        total = connection.exec_driver_sql("SELECT count(*) FROM users").scalar()
+        if indexed != total:
+            for statement in USER_SEARCH_REBUILD:
+                connection.exec_driver_sql(statement)
+
+
+def build_match_query(q: str) -> Optional[str]:
+    """
+    Превратить пользовательский ввод в безопасный запрос FTS5:
+    каждое слово — префиксный терм в кавычках, все слова обязательны.
+    """
+    words = re.findall(r"\w+", q)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def match_users(q: str):
+    """Условие WHERE users_fts MATCH для запроса build_match_query"""
+    return text("users_fts MATCH :fts_query").bindparams(fts_query=q)
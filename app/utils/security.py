@@ -1,9 +1,13 @@
+import time
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import User
+from app.schemas import CurrentUser
 from app.utils.auth import verify_access_token
+from app.utils.cache import auth_token_cache, auth_user_cache
 
 oauth2_scheme = HTTPBearer()
 
@@ -13,17 +17,49 @@ CREDENTIALS_EXCEPTION = HTTPException(
     headers={"WWW-Authenticate": "Bearer"}
 )
 
+def get_token_user_id(token: str) -> int:
+    """Проверить JWT и вернуть id пользователя (с кэшем до истечения токена)"""
+    user_id = auth_token_cache.get(token)
+    if user_id is not None:
+        return user_id
+    payload = verify_access_token(token=token)
+    sub = payload.get("sub")
+    if not sub:
+        raise CREDENTIALS_EXCEPTION
+    user_id = int(sub)
+    ttl = auth_token_cache.ttl
+    if payload.get("exp") is not None:
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        auth_token_cache.set(token, user_id, ttl=ttl)
+    return user_id
+
 def get_current_user(
     token: HTTPAuthorizationCredentials = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
-) -> User:
+) -> CurrentUser:
+    """
+    Снимок текущего пользователя. Обычно берется из кэша без запроса к БД;
+    ORM-объект для изменения профиля — через get_current_user_row.
+    """
     if not token or not token.credentials:
         raise CREDENTIALS_EXCEPTION
-    payload = verify_access_token(token=token.credentials)
-    user_id: str = payload.get("sub")
-    if not user_id:
-        raise CREDENTIALS_EXCEPTION
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    user_id = get_token_user_id(token.credentials)
+    current_user = auth_user_cache.get(user_id)
+    if current_user is None:
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            raise CREDENTIALS_EXCEPTION
+        current_user = CurrentUser.from_orm(user)
+        auth_user_cache.set(user_id, current_user)
+    return current_user
+
+def get_current_user_row(
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> User:
+    """ORM-строка текущего пользователя — для обработчиков, которые ее меняют"""
+    user = db.get(User, current_user.id)
     if not user:
         raise CREDENTIALS_EXCEPTION
     return user
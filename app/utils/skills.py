@@ -0,0 +1,156 @@
+"""
+Работа со справочником навыков.
+
+Справочник маленький и почти не меняется, поэтому целиком держится в памяти
+процесса (skill_catalog): ключ -> навык и префиксное дерево для автодополнения.
+Каталог загружается при старте, дополняется после commit новых навыков и
+периодически перечитывается фоновым обслуживанием.
+
+Навыки по названиям ищутся в БД по Skill.name_key одним IN-запросом
+(каталог может отставать от БД: навыки удаляют через админку), недостающие
+добавляются пачкой. Функции не делают commit — вызывающий код сам завершает
+транзакцию.
+"""
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import Skill, normalize_skill_name
+
+# Навык в каталоге: (id, name)
+CatalogEntry = Tuple[int, str]
+
+
+# ==================== КАТАЛОГ ====================
+
+class TrieNode:
+    """Узел префиксного дерева по нормализованным названиям"""
+    __slots__ = ("children", "entry")
+
+    def __init__(self):
+        self.children: Dict[str, "TrieNode"] = {}
+        self.entry: Optional[CatalogEntry] = None
+
+
+class SkillCatalog:
+    """Потокобезопасный in-memory каталог навыков"""
+
+    def __init__(self):
+        self._by_key: Dict[str, CatalogEntry] = {}
+        self._root = TrieNode()
+        self._lock = threading.Lock()
+
+    def _insert(self, key: str, entry: CatalogEntry) -> None:
+        """Добавить навык (вызывается под блокировкой)"""
+        if key in self._by_key:
+            return
+        self._by_key[key] = entry
+        node = self._root
+        for char in key:
+            node = node.children.setdefault(char, TrieNode())
+        node.entry = entry
+
+    def load(self, db: Optional[Session] = None) -> int:
+        """Перечитать каталог из БД. Возвращает количество навыков."""
+        own_session = db is None
+        db = db or SessionLocal()
+        try:
+            rows = db.query(Skill.id, Skill.name, Skill.name_key).order_by(Skill.id).all()
+        finally:
+            if own_session:
+                db.close()
+
+        catalog = SkillCatalog()
+        for skill_id, name, key in rows:
+            catalog._insert(key or normalize_skill_name(name), (skill_id, name))
+
+        with self._lock:
+            self._by_key, self._root = catalog._by_key, catalog._root
+        return len(rows)
+
+    def add_skills(self, skills: Iterable[Skill]) -> None:
+        """Добавить навыки в каталог (после commit). Уже известные пропускаются."""
+        with self._lock:
+            for skill in skills:
+                self._insert(skill.name_key or normalize_skill_name(skill.name), (skill.id, skill.name))
+
+    def discard(self, keys: Iterable[str]) -> None:
+        """Убрать из каталога навыки, которых больше нет в БД"""
+        with self._lock:
+            for key in keys:
+                if self._by_key.pop(key, None) is None:
+                    continue
+                node = self._root
+                for char in key:
+                    node = node.children.get(char)
+                    if node is None:
+                        break
+                else:
+                    node.entry = None
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[CatalogEntry]:
+        """Навыки, название которых начинается с prefix (в алфавитном порядке)"""
+        node = self._root
+        for char in normalize_skill_name(prefix):
+            node = node.children.get(char)
+            if node is None:
+                return []
+
+        # Обход в глубину по отсортированным символам до limit результатов
+        result: List[CatalogEntry] = []
+        stack = [node]
+        while stack and len(result) < limit:
+            current = stack.pop()
+            if current.entry is not None:
+                result.append(current.entry)
+            stack.extend(current.children[char] for char in sorted(current.children, reverse=True))
+        return result
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+
+skill_catalog = SkillCatalog()
+
+
+# ==================== РАЗРЕШЕНИЕ НАЗВАНИЙ ====================
+
+
+def resolve_skills(db: Session, skill_names: List[str]) -> List[Skill]:
+    """
+    Получить навыки по названиям (без учета регистра), создав недостающие.
+    Порядок — как во входном списке, повторы и пустые названия отбрасываются.
+    """
+    wanted = {}
+    for name in skill_names:
+        name = name.strip()
+        key = normalize_skill_name(name)
+        if key and key not in wanted:
+            wanted[key] = name
+
+    if not wanted:
+        return []
+
+    # Один запрос по name_key; при дублях в старых данных берем самый ранний
+    existing = {}
+    for skill in db.query(Skill).filter(Skill.name_key.in_(wanted)).order_by(Skill.id):
+        existing.setdefault(skill.name_key, skill)
+
+    # Навыки, удаленные в обход API, убираем из каталога, не дожидаясь перезагрузки
+    skill_catalog.discard(key for key in wanted if key not in existing)
+
+    # Недостающие — одним INSERT ... RETURNING (name_key задаем явно: @validates
+    # при bulk insert не вызывается)
+    missing = [
+        {"name": name, "name_key": key}
+        for key, name in wanted.items() if key not in existing
+    ]
+    if missing:
+        created = db.scalars(insert(Skill).returning(Skill), missing).all()
+        existing.update({skill.name_key: skill for skill in created})
+
+    return [existing[key] for key in wanted]
+
@@ -0,0 +1,236 @@
+"""
+Массовый импорт пользователей (NDJSON / CSV).
+
+Записи читаются из потока построчно и применяются пачками по
+IMPORT_BATCH_SIZE: в памяти держится не больше одной пачки, каждая
+пачка — одна транзакция. Ошибки валидации и сохранения возвращаются
+по номерам строк, остальные записи импортируются.
+
+Формат NDJSON: одна запись UserImportRecord в JSON на строку.
+Формат CSV: первая строка — заголовок с именами полей UserImportRecord;
+skills — через ";", achievements — JSON-массив. Переводы строк внутри
+значений CSV не поддерживаются.
+"""
+import csv
+import json
+import logging
+import os
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.orm import selectinload
+
+from app.database import BackgroundSessionLocal
+from app.models import Achievement, Role, User, normalize_skill_name
+from app.schemas import UserImportError, UserImportRecord, UserImportResponse
+from app.utils.achievements import refresh_achievement_stats
+from app.utils.cache import invalidate_user, user_count_cache
+from app.utils.skills import resolve_skills, skill_catalog
+
+logger = logging.getLogger(__name__)
+
+# Сколько записей применять за одну транзакцию
+IMPORT_BATCH_SIZE = 500
+
+# Сколько ошибок возвращать в ответе (остальные только считаются)
+MAX_REPORTED_ERRORS = 1000
+
+IMPORT_FORMATS = ("ndjson", "csv")
+
+# Telegram ID организаторов, которым разрешен импорт (через запятую).
+# Импорт перезаписывает чужие профили, поэтому по умолчанию он закрыт для всех.
+IMPORT_ADMIN_TG_IDS = {
+    int(tg_id) for tg_id in os.getenv("IMPORT_ADMIN_TG_IDS", "").split(",") if tg_id.strip()
+}
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    """
+    Разбить поток байтов на пронумерованные строки (пустые пропускаются).
+    Строки не декодируются: ошибка кодировки — ошибка одной строки (UserImporter.feed).
+    """
+    buffer = b""
+    line_no = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for raw in lines:
+            line_no += 1
+            if raw.strip():
+                yield line_no, raw.strip()
+    if buffer.strip():
+        yield line_no + 1, buffer.strip()
+
+
+def format_validation_error(error: ValidationError) -> str:
+    """Короткое описание ошибок pydantic: 'поле: сообщение; ...'"""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}"
+        for err in error.errors()
+    )
+
+
+class UserImporter:
+    """Разбор, валидация и пакетное применение записей импорта"""
+
+    def __init__(self, import_format: str, batch_size: int = IMPORT_BATCH_SIZE):
+        self.import_format = import_format
+        self.batch_size = batch_size
+        self.csv_header: Optional[List[str]] = None
+        self.batch: List[Tuple[int, UserImportRecord]] = []
+        self.result = UserImportResponse()
+
+    # ---------- разбор ----------
+
+    def add_error(self, line: int, detail: str, tg_id: Optional[int] = None) -> None:
+        """Учесть ошибку записи"""
+        self.result.failed += 1
+        if len(self.result.errors) < MAX_REPORTED_ERRORS:
+            self.result.errors.append(UserImportError(line=line, tg_id=tg_id, detail=detail))
+
+    def parse_line(self, raw: bytes) -> Optional[dict]:
+        """Строка -> сырые данные записи (None для заголовка CSV)"""
+        # utf-8-sig: выгрузки из Excel начинаются с BOM
+        line = raw.decode("utf-8-sig")
+        if self.import_format == "ndjson":
+            data = json.loads(line)
+            if not isinstance(data, dict):
+                raise ValueError("ожидается JSON-объект")
+            return data
+
+        values = next(csv.reader([line]))
+        if self.csv_header is None:
+            self.csv_header = [name.strip() for name in values]
+            return None
+
+        data = {
+            name: value.strip()
+            for name, value in zip(self.csv_header, values)
+            if value.strip()
+        }
+        if "skills" in data:
+            data["skills"] = [name for name in data["skills"].split(";") if name.strip()]
+        if "achievements" in data:
+            data["achievements"] = json.loads(data["achievements"])
+        return data
+
+    def feed(self, line_no: int, line: bytes) -> bool:
+        """
+        Разобрать и провалидировать строку.
+        Возвращает True, когда накопилась полная пачка и пора вызвать flush().
+        """
+        try:
+            data = self.parse_line(line)
+        except UnicodeDecodeError:
+            self.add_error(line_no, "Некорректная строка: ожидается кодировка UTF-8")
+            return False
+        except (ValueError, csv.Error) as e:
+            self.add_error(line_no, f"Некорректная строка: {e}")
+            return False
+        if data is None:
+            return False
+
+        try:
+            record = UserImportRecord(**data)
+        except ValidationError as e:
+            tg_id = data.get("tg_id")
+            self.add_error(line_no, format_validation_error(e), tg_id if isinstance(tg_id, int) else None)
+            return False
+
+        self.batch.append((line_no, record))
+        return len(self.batch) >= self.batch_size
+
+    # ---------- применение ----------
+
+    def flush(self) -> None:
+        """Применить накопленную пачку одной транзакцией (синхронно)"""
+        if not self.batch:
+            return
+        batch, self.batch = self.batch, []
+
+        # Своя коннекция: rollback неудачной пачки не трогает транзакции API
+        db = BackgroundSessionLocal()
+        try:
+            created, updated, achievements, users, skills = self.apply_batch(db, batch)
+            db.commit()
+            user_ids = [user.id for user in users]
+        except Exception as e:
+            db.rollback()
+            logger.error(f"✗ Ошибка импорта пачки: {e}", exc_info=True)
+            for line_no, record in batch:
+                self.add_error(line_no, f"Ошибка сохранения пачки: {e}", record.tg_id)
+            return
+        finally:
+            db.close()
+
+        self.result.created += created
+        self.result.updated += updated
+        self.result.achievements_added += achievements
+
+        skill_catalog.add_skills(skills)
+        invalidate_user(*user_ids)
+        if created:
+            user_count_cache.clear()
+
+    def apply_batch(self, db, batch: List[Tuple[int, UserImportRecord]]) -> tuple:
+        """
+        Upsert пользователей по tg_id, навыки — одним resolve_skills на пачку.
+        Возвращает (created, updated, achievements, users, skills).
+        """
+        # Повторы tg_id внутри пачки применяются к одному пользователю по порядку
+        records: Dict[int, List[UserImportRecord]] = {}
+        for _, record in batch:
+            records.setdefault(record.tg_id, []).append(record)
+
+        existing = {
+            user.tg_id: user
+            for user in db.query(User).options(selectinload(User.skills)).filter(User.tg_id.in_(records))
+        }
+
+        skill_names = [name for group in records.values() for record in group for name in record.skills or []]
+        skills_by_key = {skill.name_key: skill for skill in resolve_skills(db, skill_names)}
+
+        now = datetime.utcnow()
+        created = updated = achievements = 0
+        users = []
+        for tg_id, group in records.items():
+            user = existing.get(tg_id)
+            if user is None:
+                user = User(tg_id=tg_id, full_name=group[0].full_name, bio="", ready_to_work=True)
+                db.add(user)
+                created += 1
+            else:
+                user.updated_at = now
+                updated += 1
+
+            for record in group:
+                user.full_name = record.full_name
+                if record.username:
+                    user.username = record.username
+                if record.bio is not None:
+                    user.bio = record.bio
+                if record.main_role is not None:
+                    user.main_role = Role[record.main_role.value]
+                if record.ready_to_work is not None:
+                    user.ready_to_work = record.ready_to_work
+
+                if record.skills is not None:
+                    keys = dict.fromkeys(normalize_skill_name(name) for name in record.skills)
+                    user.skills = [skills_by_key[key] for key in keys if key]
+
+                # Связь через user= не загружает уже существующие достижения пользователя
+                for achievement in record.achievements:
+                    db.add(Achievement(user=user, **achievement.dict()))
+                    achievements += 1
+
+            users.append(user)
+
+        # Пересчет статистики — после flush, когда у новых пользователей уже есть id
+        db.flush()
+        refresh_achievement_stats(db, [
+            user.id for user, group in zip(users, records.values())
+            if any(record.achievements for record in group)
+        ])
+
+        return created, updated, achievements, users, list(skills_by_key.values())
@@ -0,0 +1,77 @@
+"""
+Бенчмарк поиска пользователя по username без учета регистра.
+
+Сравнивает старый вариант (ilike по users.username — полный скан таблицы)
+с равенством по индексированной колонке users.username_key.
+Создает отдельную временную БД, рабочую hackathon.db не трогает.
+
+Запуск: python bench_username_lookup.py [количество_пользователей]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import User, normalize_username
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+LOOKUPS = 200
+
+print("=" * 70)
+print(f"БЕНЧМАРК ПОИСКА ПО USERNAME ({USERS} пользователей, {LOOKUPS} запросов)")
+print("=" * 70)
+
+db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+engine = create_engine(f"sqlite:///{db_path}")
+Base.metadata.create_all(engine)
+Session = sessionmaker(bind=engine)
+
+print("\n[1] Заполнение таблицы users...")
+rows = [
+    {
+        "tg_id": 10_000_000 + i,
+        "username": f"User_{i}",
+        "username_key": normalize_username(f"User_{i}"),
+        "full_name": f"User {i}",
+        "bio": "",
+        "ready_to_work": True,
+    }
+    for i in range(USERS)
+]
+with engine.begin() as connection:
+    connection.execute(insert(User), rows)
+print(f"   OK: {USERS} строк")
+
+# Ищем имена в другом регистре, равномерно по таблице
+targets = [f"USER_{i}" for i in range(0, USERS, max(1, USERS // LOOKUPS))][:LOOKUPS]
+
+
+def run(label, make_filter):
+    """Выполнить все поиски и вывести среднее время одного запроса"""
+    db = Session()
+    try:
+        started = time.perf_counter()
+        for username in targets:
+            user = db.query(User).filter(make_filter(username)).first()
+            assert user is not None, username
+        elapsed = (time.perf_counter() - started) / len(targets) * 1000
+    finally:
+        db.close()
+    print(f"   {label:<40} {elapsed:8.3f} мс/запрос")
+    return elapsed
+
+
+print("\n[2] Поиск...")
+old = run("ilike(username)", lambda username: User.username.ilike(username))
+new = run("username_key == normalize_username()", lambda username: User.username_key == normalize_username(username))
+
+print("\n" + "=" * 70)
+print(f"УСКОРЕНИЕ: x{old / new:.1f}")
+print("=" * 70)
+
+engine.dispose()
+os.remove(db_path)
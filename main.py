@@ -1,7 +1,9 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 
@@ -12,7 +14,14 @@ logger = logging.getLogger(__name__)
 logger.info("Начинаем инициализацию приложения...")
 
 try:
-    from app.database import engine, Base
+    from app.database import (
+        engine,
+        Base,
+        SessionLocal,
+        backfill_normalized_column,
+        create_missing_columns,
+        create_missing_indexes,
+    )
     logger.info("✓ Database импортирован")
 except Exception as e:
     logger.error(f"✗ Ошибка импорта database: {e}", exc_info=True)
@@ -60,18 +69,72 @@ except Exception as e:
     logger.error(f"✗ Ошибка импорта auth router: {e}", exc_info=True)
     raise
 
-# Импортируем модели для админ-панели
-from app.models import User, Hackathon, Team, Skill, Achievement
+try:
+    from app.routers import events as events_router
+    logger.info("✓ Events router импортирован")
+except Exception as e:
+    logger.error(f"✗ Ошибка импорта events router: {e}", exc_info=True)
+    raise
 
-# Создаем таблицы БД
 try:
-    Base.metadata.create_all(bind=engine)
-    logger.info("✓ Таблицы БД созданы")
+    from app.routers import skills as skills_router
+    logger.info("✓ Skills router импортирован")
 except Exception as e:
-    logger.error(f"✗ Ошибка создания таблиц: {e}", exc_info=True)
+    logger.error(f"✗ Ошибка импорта skills router: {e}", exc_info=True)
+    raise
+
+# Импортируем модели для админ-панели
+from app.models import User, Hackathon, Team, Skill, Achievement, normalize_skill_name, normalize_username
+from app.utils.skills import skill_catalog
+from app.utils.search import init_user_search
+from app.utils.achievements import backfill_achievement_stats
+from app.utils.maintenance import expire_duplicate_pending_requests, maintenance_loop, migrate_request_ids
+from app.utils.cache import CACHES
+
+# Создаем таблицы БД и догоняем схему существующей БД.
+# Каждый шаг — отдельные транзакции и отдельный try: ошибка одного шага
+# не должна молча отменять остальные.
+def expire_duplicate_requests():
+    db = SessionLocal()
+    try:
+        return expire_duplicate_pending_requests(db)
+    finally:
+        db.close()
+
+
+STARTUP_STEPS = [
+    ("Таблицы БД созданы", lambda: Base.metadata.create_all(bind=engine)),
+    ("Новые колонки добавлены", create_missing_columns),
+    ("requests переведена на AUTOINCREMENT (перенумеровано)", migrate_request_ids),
+    # До индексов: дубликаты pending-запросов не дают создать уникальные индексы
+    ("Дубликаты pending-запросов истекли", expire_duplicate_requests),
+    ("Индексы созданы", create_missing_indexes),
+    ("Ключи навыков заполнены", lambda: backfill_normalized_column(Skill.name_key, Skill.name, normalize_skill_name)),
+    ("Ключи username заполнены", lambda: backfill_normalized_column(User.username_key, User.username, normalize_username)),
+    ("Статистика достижений заполнена", backfill_achievement_stats),
+    ("Полнотекстовый поиск инициализирован", init_user_search),
+]
+
+for step_name, step in STARTUP_STEPS:
+    try:
+        result = step()
+        logger.info(f"✓ {step_name}" + (f": {result}" if result else ""))
+    except Exception as e:
+        logger.error(f"✗ Ошибка шага «{step_name}»: {e}", exc_info=True)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Запуск и остановка фоновых задач вместе с приложением"""
+    logger.info(f"✓ Каталог навыков загружен: {skill_catalog.load()}")
+    maintenance_task = asyncio.create_task(maintenance_loop())
+    logger.info("✓ Фоновое обслуживание запущено")
+    yield
+    maintenance_task.cancel()
+
 
 # Создаем приложение
-app = FastAPI(title="Hackathon API")
+app = FastAPI(title="Hackathon API", lifespan=lifespan)
 logger.info("✓ FastAPI приложение создано")
 
 # ==================== MIDDLEWARE ====================
@@ -115,6 +178,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Разрешаем любые методы (GET, POST и т.д.)
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "ETag"],  # Пагинация и ETag должны быть видны фронтенду
 )
 
 # Подключаем роутеры
@@ -124,6 +188,8 @@ app.include_router(teams.router)
 app.include_router(requests_router.router)
 app.include_router(recommendations_router.router)
 app.include_router(auth_router.router)
+app.include_router(events_router.router)
+app.include_router(skills_router.router)
 logger.info("✓ Роутеры подключены")
 
 
@@ -221,6 +287,11 @@ def read_root():
 def admin_status():
     return {"admin_enabled": admin_enabled, "admin_url": "http://localhost:8000/admin" if admin_enabled else "Админ-панель не установлена"}
 
+@app.get("/cache-stats")
+def cache_stats():
+    """Размер и hit rate всех in-process кэшей"""
+    return {name: cache.stats() for name, cache in CACHES.items()}
+
 # Запуск сервера, если файл запущен напрямую
 if __name__ == "__main__":
     logger.info("🚀 Запуск сервера на http://0.0.0.0:8000")